@@ -1,14 +1,21 @@
 """
 Pathfinding App
 
-GUI to visualize the different pathfinding algorithms: Breadth First Search, Dijkstra, Greedy BFS, and A*.
+GUI to visualize the different pathfinding algorithms: Breadth First Search, Dijkstra, Greedy BFS, A*,
+weighted A*, ARA* (anytime A*), Jump Point Search, bidirectional Dijkstra and A*, D* Lite and HPA*.
 """
+import argparse
+import os
 import pygame
-import random
 import sys
 
+import grid
+import maps
+import search
 from pathfind import Pathfinder
-from utils import Button, get_cell_location
+from render import Renderer
+import wavefront
+from utils import Button
 
 
 class App():
@@ -20,200 +27,318 @@ class App():
     LIGHT_BLUE = (119,226,247)
     LIGHT_RED = (224,74,74)
 
-    SCREEN_WIDTH = 500
-    SCREEN_HEIGHT = 700
-
-    def __init__(self):
+    SCREEN_WIDTH = 500 # minimum, grows with the grid
+    PANEL_HEIGHT = 430 # buttons, instructions and search stats below the grid
+    MAX_GRID_SIZE = 800 # pixels the grid may take when the cell size is picked automatically
+
+    # Text drawn under the grid, with its position relative to the top of the panel
+    INSTRUCTIONS = [
+        ("BOTH PAWNS MUST BE ON BOARD BEFORE SEARCH", 80, 20),
+        ("< CLICK BUTTON TO CHANGE TERRAIN", 40, 230),
+        ("purple = walls", 10, 255),
+        ("light blue = water", 10, 270),
+        ("HOLD OR PRESS left click (draw terrain or pawns)", 150, 310),
+        ("HOLD OR PRESS right click (erase terrain or pawns)", 150, 325),
+    ]
+
+    def __init__(self, rows=20, cols=20, cell_size=None, cache_size=128, stats_file=None, map_file="map.pfm",
+                 weight=search.WEIGHT, cluster_size=search.CLUSTER_SIZE, connectivity=4, cutting=grid.CUT_NONE):
         pygame.init()
-        self.screen = pygame.display.set_mode((self.SCREEN_WIDTH,self.SCREEN_HEIGHT))
-        pygame.display.set_caption("Pathfinder")
-
-        self.grid = list() # grid coords
-
-        self.clear_btn = Button(220, 470, 60, 30, "Clear", self.WHITE)
-
-        self.bfs_btn = Button(10, 520, 60, 30, "BFS", self.WHITE)
-        self.dijkstra_btn = Button(150, 520, 60, 30, "Dijkstra", self.WHITE)
-        self.heap_btn = Button(290, 520, 60, 30, "Greedy", self.WHITE)
-        self.a_star_btn = Button(430, 520, 60, 30, "A*", self.WHITE)
-
-        self.terrain_btn = Button(10, 570, 20, 20, None, self.PURPLE)
-
+        self.cache_size = cache_size # searches remembered by the Pathfinder
+        self.stats_file = stats_file # search stats are appended here
+        self.stats_enabled = stats_file is not None # instrument searches and show the overlay
+        self.map_file = map_file # where Save writes and Load reads the map
+        self.weight = weight # heuristic weight of weighted A* and ARA*
+        self.cluster_size = cluster_size # cluster side of HPA*
+        self.connectivity = connectivity # moves to 4 or 8 neighbors
+        self.cutting = cutting # corner cutting of diagonal moves
+        # Cycled by the heuristic button, None is the grid's default; only those fitting the moves
+        self.heuristics = [None] + grid.heuristics(connectivity)
+        self.heuristic_index = 0 # into heuristics, kept across maps
         self.font = pygame.font.SysFont('comicsans', 20)
 
+        self.layout(rows, cols, cell_size)
         self.setup()
 
-    def setup(self):
-        """Important feautures of the game. Used to reset board as well."""
-        self.screen.fill(self.BLACK)
-        self.create_grid(0, 20) # draws grid
-
-        self.path = Pathfinder(self.grid, self.screen)
+    def layout(self, rows, cols, cell_size=None):
+        """Sizes the window to the grid and places the buttons under it."""
+        if cell_size is None: # fit big grids on screen
+            cell_size = max(1, min(20, self.MAX_GRID_SIZE // max(rows, cols)))
+        self.geometry = grid.Geometry(rows, cols, cell_size)
 
-        self.draw_all_btns()
-
-        pawn_instructions = self.font.render("BOTH PAWNS MUST BE ON BOARD BEFORE SEARCH", 1, self.WHITE)
-        terrain_instructions = self.font.render("< CLICK BUTTON TO CHANGE TERRAIN", 1, self.WHITE)
-        wall_instructions = self.font.render("purple = walls", 1, self.WHITE)
-        water_instructions = self.font.render("light blue = water", 1, self.WHITE)
-        draw_instructions = self.font.render("HOLD OR PRESS left click (draw terrain or pawns)", 1, self.WHITE)
-        erase_instructions = self.font.render("HOLD OR PRESS right click (erase terrain or pawns)", 1, self.WHITE)
+        screen_width = max(self.SCREEN_WIDTH, self.geometry.width + 2 * self.geometry.x)
+        self.panel = self.geometry.y + self.geometry.height # top of the button panel
+        self.screen = pygame.display.set_mode((screen_width, self.panel + self.PANEL_HEIGHT))
+        pygame.display.set_caption("Pathfinder")
+        speed_index = self.renderer.speed_index if hasattr(self, "renderer") else 1 # kept across maps
+        self.renderer = Renderer(self.screen, self.geometry)
+        self.renderer.speed_index = speed_index
+        self.background_surface = None # made by background() for this size
+
+        self.clear_btn = Button(220, self.panel + 50, 60, 30, "Clear", self.WHITE)
+        self.save_btn = Button(150, self.panel + 50, 60, 30, "Save", self.WHITE)
+        self.load_btn = Button(290, self.panel + 50, 60, 30, "Load", self.WHITE)
+        self.speed_btn = Button(400, self.panel + 50, 90, 30, self.renderer.speed_name, self.WHITE)
+        self.pause_btn = Button(10, self.panel + 50, 60, 30, "Pause", self.WHITE)
+        self.step_btn = Button(80, self.panel + 50, 60, 30, "Step", self.WHITE)
+        self.paused = False # holds the running search
+
+        self.bfs_btn = Button(10, self.panel + 100, 60, 30, "BFS", self.WHITE)
+        self.dijkstra_btn = Button(150, self.panel + 100, 60, 30, "Dijkstra", self.WHITE)
+        self.heap_btn = Button(290, self.panel + 100, 60, 30, "Greedy", self.WHITE)
+        self.a_star_btn = Button(430, self.panel + 100, 60, 30, "A*", self.WHITE)
+
+        self.jps_btn = Button(10, self.panel + 140, 60, 30, "JPS", self.WHITE)
+        self.bi_dijkstra_btn = Button(140, self.panel + 140, 80, 30, "Bi-Dijkstra", self.WHITE)
+        self.bi_a_star_btn = Button(290, self.panel + 140, 60, 30, "Bi-A*", self.WHITE)
+        self.stats_btn = Button(420, self.panel + 140, 70, 30, self.stats_label(), self.WHITE)
+
+        self.heat_btn = Button(10, self.panel + 180, 60, 30, "Heat", self.WHITE)
+        self.d_star_btn = Button(140, self.panel + 180, 80, 30, "D* Lite", self.WHITE)
+        self.weighted_btn = Button(290, self.panel + 180, 60, 30, "W-A*", self.WHITE)
+        self.ara_star_btn = Button(430, self.panel + 180, 60, 30, "ARA*", self.WHITE)
+
+        self.heuristic_btn = Button(310, self.panel + 225, 90, 30, self.heuristic_label(), self.WHITE)
+        self.hpa_star_btn = Button(430, self.panel + 225, 60, 30, "HPA*", self.WHITE)
+
+        self.terrain_btn = Button(10, self.panel + 230, 20, 20, None, self.PURPLE)
+
+        # Buttons that light up when hovered, and the Pathfinder search each search button starts
+        self.btns = [self.clear_btn, self.save_btn, self.load_btn, self.speed_btn, self.pause_btn, self.step_btn,
+                     self.bfs_btn, self.dijkstra_btn, self.heap_btn, self.a_star_btn,
+                     self.jps_btn, self.bi_dijkstra_btn, self.bi_a_star_btn, self.stats_btn,
+                     self.heat_btn, self.d_star_btn, self.weighted_btn, self.ara_star_btn,
+                     self.heuristic_btn, self.hpa_star_btn]
+        self.search_btns = [(self.bfs_btn, "bfs"), (self.dijkstra_btn, "dijkstra"),
+                            (self.heap_btn, "greedy"), (self.a_star_btn, "a_star"),
+                            (self.jps_btn, "jps"), (self.bi_dijkstra_btn, "bidirectional_dijkstra"),
+                            (self.bi_a_star_btn, "bidirectional_a_star"), (self.d_star_btn, "d_star_lite"),
+                            (self.weighted_btn, "weighted_a_star"), (self.ara_star_btn, "ara_star"),
+                            (self.hpa_star_btn, "hpa_star")]
+
+    def setup(self, terrain=None, start=None, end=None):
+        """Important feautures of the game. Used to reset board as well, or to show a loaded map."""
+        self.screen.blit(self.background(), (0, 0)) # empty grid and instructions in one blit
+        pygame.display.update()
 
-        self.screen.blit(pawn_instructions, (80, 440))
-        self.screen.blit(terrain_instructions, (40, 570))
-        self.screen.blit(wall_instructions, (10, 595))
-        self.screen.blit(water_instructions, (10,610))
-        self.screen.blit(draw_instructions, (150, 650))
-        self.screen.blit(erase_instructions, (150, 665))
+        self.path = Pathfinder(self.renderer, self.cache_size, self.stats_enabled, self.stats_file,
+                               terrain, start, end, self.weight, self.cluster_size, self.connectivity, self.cutting,
+                               self.heuristics[self.heuristic_index])
+        self.set_paused(False)
 
-    def create_grid(self, y, w):
-        """Creates the grid."""
-        for i in range(1, 21):
-            x = 50 # set x coord to start
-            y += 20 # moves on to the new row
+        self.draw_all_btns(everything=True)
+        self.stats_lines = None
 
-            for j in range(1, 21):
-                pygame.draw.line(self.screen, self.WHITE, [x,y], [x + w, y]) # top of cell
-                pygame.draw.line(self.screen, self.WHITE, [x + w, y], [x + w, y + w]) # right of cell
-                pygame.draw.line(self.screen, self.WHITE, [x + w, y + w], [x, y + w]) # bottom of cell
-                pygame.draw.line(self.screen, self.WHITE, [x, y + w], [x, y]) # left of cell
+    def background(self):
+        """The screen with an empty grid and the instructions, rendered once per layout."""
+        if self.background_surface is None:
+            self.background_surface = pygame.Surface(self.screen.get_size())
+            self.background_surface.fill(self.BLACK)
+            self.renderer.draw_grid(self.background_surface, self.WHITE)
 
-                self.grid.append((x,y))
+            for text, x, y in self.INSTRUCTIONS:
+                self.background_surface.blit(self.font.render(text, 1, self.WHITE), (x, self.panel + y))
 
-                x += 20 # moves on to the new column
+        return self.background_surface
 
-        pygame.display.update()
-
-    def color_single_cell(self, color, x, y):
+    def color_single_cell(self, color, cell):
         """Colors in a perfect rect inbetween a grid cell."""
-        pygame.draw.rect(self.screen, color, (x + 1, y + 1, 18, 18), 0)
-        pygame.display.update()
-
-    def draw_all_btns(self):
-        """Draws all buttons being used."""
-        self.clear_btn.draw_button(self.screen)
-        self.bfs_btn.draw_button(self.screen)
-        self.dijkstra_btn.draw_button(self.screen)
-        self.heap_btn.draw_button(self.screen)
-        self.a_star_btn.draw_button(self.screen)
-
-        self.terrain_btn.draw_button(self.screen)
+        self.renderer.color_cell(color, cell)
+
+    def save_map(self):
+        """Writes the terrain and pawns to the map file."""
+        maps.save_binary(self.path.terrain, self.map_file, self.path.start_pawn, self.path.end_pawn)
+
+    def load_map(self):
+        """Replaces the board with the map file, resizing the window if the map is another size."""
+        if not os.path.exists(self.map_file):
+            return
+
+        terrain, start, end = maps.load(self.map_file)
+        if (terrain.rows, terrain.cols) != (self.geometry.rows, self.geometry.cols):
+            self.layout(terrain.rows, terrain.cols)
+        self.setup(terrain, start, end)
+
+    def heuristic_label(self):
+        return (self.heuristics[self.heuristic_index] or "default h").capitalize()
+
+    def stats_label(self):
+        return "Stats on" if self.stats_enabled else "Stats off"
+
+    def draw_stats(self):
+        """Shows the stats of the running or last search under the buttons, only redrawn when
+        they changed."""
+        lines = self.path.stats.summary() if self.path.stats is not None else list()
+        anytime = self.path.anytime
+        if anytime is not None and anytime.bound is not None: # how good the ARA* path is so far
+            lines.append("ARA* weight %.2f: cost %s, at most %.2fx the cheapest" % (anytime.weight, anytime.cost, anytime.bound))
+
+        if lines == self.stats_lines:
+            return
+        self.stats_lines = lines
+
+        top = self.panel + self.PANEL_HEIGHT - 85
+        area = pygame.draw.rect(self.screen, self.BLACK, (0, top, self.screen.get_width(), 85), 0)
+        for i, line in enumerate(lines):
+            self.screen.blit(self.font.render(line, 1, self.WHITE), (10, top + 5 + i * 18))
+        self.renderer.mark(area)
+
+    def set_paused(self, paused):
+        """Holds or resumes the running search."""
+        self.paused = paused
+        self.pause_btn.text = "Resume" if paused else "Pause"
+
+    def draw_all_btns(self, everything=False):
+        """Draws the buttons whose color or text changed since they were last drawn, or all of them."""
+        for btn in self.btns + [self.terrain_btn]:
+            if everything or btn.changed:
+                self.renderer.mark(btn.draw_button(self.screen))
 
     def launch(self):
         """Main game loop."""
-        clock = pygame.time.Clock()
-
         while True:
 
-            self.draw_all_btns()
-            pygame.display.update()
-
             for event in pygame.event.get():
                 pos = pygame.mouse.get_pos()
 
+                if event.type == pygame.KEYDOWN and self.path.searching: # a key press stops the search
+                    self.path.cancel_search()
+                    continue
+
                 if event.type == pygame.QUIT or event.type == pygame.KEYDOWN:
                     pygame.quit()
                     sys.exit()
 
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    if self.pause_btn.is_over(pos): # hold or resume the search
+                        self.set_paused(not self.paused)
+
+                    elif self.step_btn.is_over(pos) and self.paused: # one event at a time
+                        self.path.advance(1)
+
+                    elif self.speed_btn.is_over(pos): # animation speed of the searches
+                        self.renderer.next_speed()
+                        self.speed_btn.text = self.renderer.speed_name
+
+                    elif self.heuristic_btn.is_over(pos): # heuristic of the next A* style searches
+                        self.heuristic_index = (self.heuristic_index + 1) % len(self.heuristics)
+                        self.path.heuristic = self.heuristics[self.heuristic_index]
+                        self.heuristic_btn.text = self.heuristic_label()
+
+                    elif self.stats_btn.is_over(pos): # instrument the next searches
+                        self.stats_enabled = not self.stats_enabled
+                        self.path.stats_enabled = self.stats_enabled
+                        self.stats_btn.text = self.stats_label()
+
                 if pygame.mouse.get_pressed() == (1,0,0):
 
                     if self.clear_btn.is_over(pos): # clear board
                         self.setup()
 
-                    # Search path algorithm only if both pawns are on board.
-                    if self.path.start_pawn and self.path.end_pawn:
-                        if self.bfs_btn.is_over(pos):
-                            self.path.bfs()
+                    if event.type == pygame.MOUSEBUTTONDOWN and self.save_btn.is_over(pos):
+                        self.save_map()
 
-                        elif self.dijkstra_btn.is_over(pos):
-                            self.path.dijkstra()
+                    elif event.type == pygame.MOUSEBUTTONDOWN and self.load_btn.is_over(pos):
+                        self.load_map()
+                        continue # the old board is gone, so is this click
 
-                        elif self.heap_btn.is_over(pos):
-                            self.path.greedy()
+                    # Search path algorithm only if both pawns are on board, once per click.
+                    if event.type == pygame.MOUSEBUTTONDOWN and self.path.start_pawn is not None and self.path.end_pawn is not None:
+                        for btn, name in self.search_btns:
+                            if btn.is_over(pos):
+                                getattr(self.path, name)()
+                                self.set_paused(False)
 
-                        elif self.a_star_btn.is_over(pos):
-                            self.path.a_star()
+                        if self.heat_btn.is_over(pos) and wavefront.available(): # needs numpy
+                            self.path.heatmap()
 
-                        elif self.terrain_btn.is_over(pos) and self.terrain_btn.color == self.PURPLE:
+                        if self.terrain_btn.is_over(pos) and self.terrain_btn.color == self.PURPLE:
                             self.terrain_btn.color = self.LIGHT_BLUE
 
                         elif self.terrain_btn.is_over(pos) and self.terrain_btn.color == self.LIGHT_BLUE:
                             self.terrain_btn.color = self.PURPLE
 
                     # Left Click actions within the board
-                    if pos[0] >= self.grid[0][0] and pos[0] <= self.grid[-1][0] + 20:
-                        if pos[1] >= self.grid[0][1] and pos[1] <= self.grid[-1][1] + 20:
+                    if self.geometry.contains(pos):
 
-                            # Checks if start pawn and end pawn are on board.
-                            # If not draw them next, they're the most prioritized
-                            # then drawing walls or water.
-                            wanted_cell = get_cell_location(pos)
-                            if self.path.start_pawn and self.path.end_pawn:
-                                if wanted_cell != self.path.start_pawn and wanted_cell != self.path.end_pawn:
+                        # Checks if start pawn and end pawn are on board.
+                        # If not draw them next, they're the most prioritized
+                        # then drawing walls or water.
+                        wanted_cell = self.geometry.cell_at(pos)
+                        if self.path.start_pawn is not None and self.path.end_pawn is not None:
+                            if wanted_cell != self.path.start_pawn and wanted_cell != self.path.end_pawn:
 
-                                    if self.terrain_btn.color == self.PURPLE and not wanted_cell in self.path.walls:
-                                        self.path.walls.append(wanted_cell)
-                                        self.color_single_cell(self.PURPLE, wanted_cell[0], wanted_cell[1])
+                                if self.terrain_btn.color == self.PURPLE and not self.path.terrain.is_wall(wanted_cell):
+                                    self.path.terrain.set_terrain(wanted_cell, grid.WALL)
+                                    self.path.board_changed()
+                                    self.color_single_cell(self.PURPLE, wanted_cell)
 
-                                    elif self.terrain_btn.color == self.LIGHT_BLUE and not wanted_cell in self.path.water:
-                                        self.path.water.append(wanted_cell)
-                                        self.color_single_cell(self.LIGHT_BLUE, wanted_cell[0], wanted_cell[1])
-                            else:
+                                elif self.terrain_btn.color == self.LIGHT_BLUE and not self.path.terrain.is_water(wanted_cell):
+                                    self.path.terrain.set_terrain(wanted_cell, grid.WATER)
+                                    self.path.board_changed()
+                                    self.color_single_cell(self.LIGHT_BLUE, wanted_cell)
+                        else:
 
-                                if not self.path.start_pawn:
-                                    self.path.start_pawn = wanted_cell
-                                    self.color_single_cell(self.BLUE, wanted_cell[0], wanted_cell[1])
+                            if self.path.start_pawn is None:
+                                self.path.start_pawn = wanted_cell
+                                self.path.board_changed()
+                                self.color_single_cell(self.BLUE, wanted_cell)
 
-                                elif not self.path.end_pawn:
-                                    self.path.end_pawn = wanted_cell
-                                    self.color_single_cell(self.RED, wanted_cell[0], wanted_cell[1])
+                            elif self.path.end_pawn is None:
+                                self.path.end_pawn = wanted_cell
+                                self.path.board_changed()
+                                self.color_single_cell(self.RED, wanted_cell)
 
 
                 if pygame.mouse.get_pressed() == (0,0,1):
                     # Righ Click commands within board
-                    if pos[0] >= self.grid[0][0] and pos[0] <= self.grid[-1][0] + 20:
-                        if pos[1] >= self.grid[0][1] and pos[1] <= self.grid[-1][1] + 20:
+                    if self.geometry.contains(pos):
 
-                            wanted_cell = get_cell_location(pos)
-                            self.color_single_cell(self.BLACK, wanted_cell[0], wanted_cell[1])
-                            if wanted_cell == self.path.start_pawn: # Erases the pawns
-                                self.path.start_pawn = None
+                        wanted_cell = self.geometry.cell_at(pos)
+                        self.color_single_cell(self.BLACK, wanted_cell)
+                        if wanted_cell == self.path.start_pawn: # Erases the pawns
+                            self.path.start_pawn = None
 
-                            elif wanted_cell == self.path.end_pawn:
-                                self.path.end_pawn = None
+                        elif wanted_cell == self.path.end_pawn:
+                            self.path.end_pawn = None
 
-                            elif wanted_cell in self.path.walls: # Erases wall or water cell
-                                self.path.walls.remove(wanted_cell)
-
-                            elif wanted_cell in self.path.water:
-                                self.path.water.remove(wanted_cell)
+                        else: # Erases wall or water cell
+                            self.path.terrain.set_terrain(wanted_cell, grid.OPEN)
+                        self.path.board_changed()
 
                 if event.type == pygame.MOUSEMOTION:
-                    if self.clear_btn.is_over(pos): # Changes button color if hover over
-                        self.clear_btn.color = self.LIGHT_RED
-                    else:
-                        self.clear_btn.color = self.WHITE
-
-                    if self.bfs_btn.is_over(pos):
-                        self.bfs_btn.color = self.LIGHT_RED
-                    else:
-                        self.bfs_btn.color = self.WHITE
-
-                    if self.dijkstra_btn.is_over(pos):
-                        self.dijkstra_btn.color = self.LIGHT_RED
-                    else:
-                        self.dijkstra_btn.color = self.WHITE
-
-                    if self.heap_btn.is_over(pos):
-                        self.heap_btn.color = self.LIGHT_RED
-                    else:
-                        self.heap_btn.color = self.WHITE
-
-                    if self.a_star_btn.is_over(pos):
-                        self.a_star_btn.color = self.LIGHT_RED
-                    else:
-                        self.a_star_btn.color = self.WHITE
+                    for btn in self.btns: # Changes button color if hover over
+                        if btn.is_over(pos):
+                            btn.color = self.LIGHT_RED
+                        else:
+                            btn.color = self.WHITE
+
+            if self.path.searching and not self.paused: # a bounded number of search steps per frame
+                self.path.advance(self.renderer.speed)
+
+            self.draw_all_btns()
+            self.draw_stats()
+            self.renderer.end_frame()
+
+            if self.path.stats is not None and self.path.searching:
+                self.path.stats.render_time += self.renderer.flush_time
 
 if __name__ == "__main__":
-    start = App()
+    parser = argparse.ArgumentParser(description="Visualize pathfinding algorithms on a grid.")
+    parser.add_argument("--rows", type=int, default=20, help="number of grid rows")
+    parser.add_argument("--cols", type=int, default=20, help="number of grid columns")
+    parser.add_argument("--cell-size", type=int, default=None, help="cell size in pixels (fits the screen if not given)")
+    parser.add_argument("--cache-size", type=int, default=128, help="finished searches kept for repeat clicks")
+    parser.add_argument("--stats-file", default=None, help="append search stats to this file (.csv or JSON lines), turns stats on")
+    parser.add_argument("--map-file", default="map.pfm", help="map file the Save and Load buttons use")
+    parser.add_argument("--weight", type=float, default=search.WEIGHT,
+                        help="heuristic weight (epsilon) of weighted A* and the first ARA* pass")
+    parser.add_argument("--cluster-size", type=int, default=search.CLUSTER_SIZE, help="cluster side in cells of HPA*")
+    parser.add_argument("--connectivity", type=int, choices=(4, 8), default=4, help="move to the 4 or all 8 neighbors of a cell")
+    parser.add_argument("--cutting", choices=grid.CUTTING, default=grid.CUT_NONE,
+                        help="diagonal moves past wall corners: none, past one wall, or squeezing between two")
+    args = parser.parse_args()
+
+    start = App(args.rows, args.cols, args.cell_size, args.cache_size, args.stats_file, args.map_file, args.weight,
+                args.cluster_size, args.connectivity, args.cutting)
     start.launch()
@@ -0,0 +1,143 @@
+"""
+Batch Queries
+
+Runs a file of (start, end, algorithm) queries over one map on every core. Each worker process
+maps the map cells read-only, so all of them share the same pages instead of getting the grid
+pickled with every task: binary maps are mapped straight from their file, text maps are written
+once to a temporary file first. Every worker keeps a SearchCache, so a repeated query is served
+from it instead of searched again. Results are streamed out as JSON lines in the order they
+complete, each saying whether it was cached; the hit and miss totals go to stderr.
+
+    python batch.py map.pfm queries.txt --workers 8 --output results.jsonl [--connectivity 8 --cutting one]
+
+Each query line holds "start_row start_col end_row end_col [algorithm]", blank lines and lines
+starting with # are skipped.
+"""
+import argparse
+import json
+import mmap
+import multiprocessing
+import os
+import sys
+import tempfile
+
+import maps
+import search
+from grid import CUT_NONE, CUTTING, Grid
+
+worker_grid = None # the shared grid of a worker process
+worker_cache = None # search.SearchCache of a worker process
+
+
+def load_queries(path, algorithm):
+    """Reads the query file into (index, start, end, algorithm) tuples of cell rows/columns."""
+    queries = list()
+
+    with open(path) as f:
+        for line in f:
+            fields = line.replace(",", " ").split()
+            if not fields or fields[0].startswith("#"):
+                continue
+
+            start, end = (int(fields[0]), int(fields[1])), (int(fields[2]), int(fields[3]))
+            name = fields[4] if len(fields) > 4 else algorithm
+            if name not in search.ALGORITHMS:
+                raise ValueError("unknown algorithm %r on line %r" % (name, line.strip()))
+
+            queries.append((len(queries), start, end, name))
+
+    return queries
+
+
+def share(grid):
+    """Writes the grid cells to a temporary file the workers can map, returns its path."""
+    fd, path = tempfile.mkstemp(prefix="pathfinding-", suffix=".cells")
+    with os.fdopen(fd, "wb") as f:
+        f.write(grid.cells)
+
+    return path
+
+
+def attach(path, rows, cols, connectivity=4, cutting=CUT_NONE):
+    """Worker start up: maps the shared cells read-only into a Grid moving the way given."""
+    global worker_grid, worker_cache
+
+    with open(path, "rb") as f:
+        cells = mmap.mmap(f.fileno(), rows * cols, access=mmap.ACCESS_READ) # skips a binary map's trailer
+    worker_grid = Grid(rows, cols, cells, connectivity, cutting)
+    worker_cache = search.SearchCache()
+
+
+def answer(query, paths=False):
+    """Runs one query on the worker's grid, or serves it from the worker's cache."""
+    index, start, end, name = query
+    grid = worker_grid
+    result = {"query": index, "algorithm": name, "start": list(start), "end": list(end)}
+
+    if not all(0 <= row < grid.rows and 0 <= col < grid.cols for row, col in (start, end)):
+        result.update(found=False, cost=None, expanded=0, cached=False, error="off the map")
+        return result
+
+    hits = worker_cache.hits
+    found = worker_cache.search(name, grid, grid.cell(*start), grid.cell(*end))
+    visited = found.visited # None if the cache kept only the path and cost
+
+    result.update(found=found.found, cost=found.cost, expanded=None if visited is None else len(visited),
+                  length=len(found.path), cached=worker_cache.hits > hits)
+    if paths:
+        result["path"] = [list(grid.row_col(cell)) for cell in found.path]
+
+    return result
+
+
+def answer_with_path(query):
+    return answer(query, paths=True)
+
+
+def run_batch(grid, queries, workers=None, chunksize=64, paths=False, map_path=None):
+    """Yields the result of every query as soon as a worker finishes it. Given the path of a binary
+    map holding the grid, the workers map that file instead of a temporary copy. The workers move
+    the way the grid does."""
+    path = map_path or share(grid)
+    try:
+        moves = (grid.connectivity, grid.cutting)
+        with multiprocessing.Pool(workers, initializer=attach, initargs=(path, grid.rows, grid.cols) + moves) as pool:
+            yield from pool.imap_unordered(answer_with_path if paths else answer, queries, chunksize)
+    finally:
+        if not map_path:
+            os.remove(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run pathfinding queries over a map in parallel.")
+    parser.add_argument("map", help="binary map or text map file ('.' open, '#' wall, '~' water)")
+    parser.add_argument("queries", help="query file, one 'start_row start_col end_row end_col [algorithm]' per line")
+    parser.add_argument("--algorithm", default="a_star", choices=list(search.ALGORITHMS),
+                        help="algorithm of queries that don't name one")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (all cores if not given)")
+    parser.add_argument("--chunksize", type=int, default=64, help="queries handed to a worker at once")
+    parser.add_argument("--paths", action="store_true", help="include the path cells in the output")
+    parser.add_argument("--output", default=None, help="file to write to (stdout if not given)")
+    parser.add_argument("--connectivity", type=int, choices=(4, 8), default=4, help="move to the 4 or all 8 neighbors of a cell")
+    parser.add_argument("--cutting", choices=CUTTING, default=CUT_NONE, help="diagonal moves past wall corners")
+    args = parser.parse_args(argv)
+
+    grid = maps.load(args.map, writable=False)[0]
+    grid.set_moves(args.connectivity, args.cutting)
+    queries = load_queries(args.queries, args.algorithm)
+    map_path = args.map if maps.read_trailer(args.map) else None
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    hits = 0
+    try:
+        for result in run_batch(grid, queries, args.workers, args.chunksize, args.paths, map_path):
+            out.write(json.dumps(result) + "\n")
+            hits += result["cached"]
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    sys.stderr.write("cache: %d hits, %d misses\n" % (hits, len(queries) - hits))
+
+
+if __name__ == "__main__":
+    main()
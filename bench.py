@@ -0,0 +1,132 @@
+"""
+Benchmark
+
+Runs every search over seeded maps of several kinds and sizes and reports, per algorithm and
+query: wall time, nodes expanded, peak frontier size, peak memory and path cost. The wall time
+comes from a run of its own that only drains the search, so counting the frontier doesn't skew
+it; HPA* builds a fresh hierarchy for every run, so each one pays for its clusters. Output is one
+JSON object per line (or CSV) so runs of different versions can be compared.
+
+    python bench.py --sizes 50 100 200 --maps open walls-25 maze --queries 5 --output bench.jsonl
+"""
+import argparse
+import collections
+import csv
+import json
+import sys
+import time
+import tracemalloc
+
+import maps
+import search
+from grid import CUT_NONE, CUTTING
+
+FIELDS = ["map", "rows", "cols", "seed", "connectivity", "cutting", "algorithm", "start", "end", "found", "cost",
+          "seconds", "expanded", "peak_frontier", "peak_memory"]
+
+
+def fresh_steps(algorithm, grid, start, end):
+    """Search generator of the algorithm, HPA* without the hierarchy of earlier queries."""
+    if algorithm == "hpa_star":
+        search.hierarchies.pop(grid, None)
+    return search.ALGORITHMS[algorithm](grid, start, end)
+
+
+def timed(steps):
+    """Seconds taken to drive a search generator to the end, doing nothing with its events."""
+    began = time.perf_counter()
+    collections.deque(steps, maxlen=0)
+    return time.perf_counter() - began
+
+
+def measure(steps):
+    """Drives a search generator to the end, counting expansions and the largest frontier."""
+    frontier = set()
+    peak_frontier = 0
+    expanded = 0
+    path = list()
+
+    while True:
+        try:
+            kind, value = next(steps)
+        except StopIteration as stop:
+            return path, stop.value, expanded, peak_frontier
+
+        if kind == search.OPEN:
+            frontier.add(value)
+            if len(frontier) > peak_frontier:
+                peak_frontier = len(frontier)
+        elif kind == search.CLOSE:
+            frontier.discard(value)
+            expanded += 1
+        else:
+            path = value
+
+
+def peak_memory(algorithm, grid, start, end):
+    """Bytes allocated at the peak of a search, measured in a run of its own since tracing is slow."""
+    tracemalloc.start()
+    try:
+        search.run(fresh_steps(algorithm, grid, start, end))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(kinds, sizes, algorithms, queries, seed, memory=True, connectivity=4, cutting=CUT_NONE):
+    """Yields a result row for every map kind, size, query and algorithm."""
+    for kind in kinds:
+        for size in sizes:
+            grid = maps.generate(kind, size, size, seed)
+            grid.set_moves(connectivity, cutting)
+
+            for start, end in maps.random_queries(grid, queries, seed):
+                for algorithm in algorithms:
+                    seconds = timed(fresh_steps(algorithm, grid, start, end))
+                    path, cost, expanded, peak_frontier = measure(fresh_steps(algorithm, grid, start, end))
+
+                    yield {
+                        "map": kind, "rows": size, "cols": size, "seed": seed, "connectivity": connectivity,
+                        "cutting": cutting, "algorithm": algorithm, "start": start, "end": end,
+                        "found": bool(path), "cost": cost, "seconds": round(seconds, 6),
+                        "expanded": expanded, "peak_frontier": peak_frontier,
+                        "peak_memory": peak_memory(algorithm, grid, start, end) if memory else None,
+                    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pathfinding algorithms.")
+    parser.add_argument("--maps", nargs="+", default=list(maps.KINDS), choices=list(maps.KINDS),
+                        help="map kinds to run on")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[50, 100, 200], help="square map sizes")
+    parser.add_argument("--algorithms", nargs="+", default=list(search.ALGORITHMS),
+                        choices=list(search.ALGORITHMS), help="algorithms to run")
+    parser.add_argument("--queries", type=int, default=3, help="start/end pairs per map")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the maps and queries")
+    parser.add_argument("--format", choices=["json", "csv"], default="json", help="output format")
+    parser.add_argument("--output", default=None, help="file to write to (stdout if not given)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run measuring peak memory")
+    parser.add_argument("--connectivity", type=int, choices=(4, 8), default=4, help="move to the 4 or all 8 neighbors of a cell")
+    parser.add_argument("--cutting", choices=CUTTING, default=CUT_NONE, help="diagonal moves past wall corners")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            writer = csv.DictWriter(out, fieldnames=FIELDS)
+            writer.writeheader()
+
+        for row in bench(args.maps, args.sizes, args.algorithms, args.queries, args.seed, not args.no_memory,
+                         args.connectivity, args.cutting):
+            if args.format == "csv":
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(row) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
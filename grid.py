@@ -0,0 +1,342 @@
+"""
+Grid and Geometry Classes
+
+Terrain of the board stored as one cost byte per cell in a flat bytearray. Cells are integer ids
+(row * cols + col); Geometry turns them into pixels for the GUI. Components keeps track of which
+cells can reach each other.
+
+Moves go to the 4 sides of a cell, or to all 8 cells around it. A diagonal move costs DIAGONAL
+times its cell's cost and may or may not cut past the corner of a wall (see CUTTING).
+"""
+import math
+import re
+from array import array
+
+WALL = 0 # impassable
+OPEN = 20 # cost of stepping onto an open cell
+WATER = 70 # cost of stepping onto a water cell
+
+# Cost of stepping diagonally onto a cell by its terrain: sqrt(2) times the cost, rounded up so
+# the octile and euclidean heuristics never overestimate
+DIAGONAL = [math.ceil(terrain * math.sqrt(2)) for terrain in range(256)]
+
+# Corner cutting of diagonal moves: never past a wall, past one wall, or squeezing between two
+CUT_NONE = "none"
+CUT_ONE = "one"
+CUT_BOTH = "both"
+CUTTING = [CUT_NONE, CUT_ONE, CUT_BOTH]
+
+HEURISTICS = ["manhattan", "octile", "euclidean", "chebyshev"]
+
+# (row, column) steps: the 4 sides first, then the diagonals
+MOVES = [(0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+# Bits of the borders of the board a cell lies on
+TOP, BOTTOM, LEFT, RIGHT = 1, 2, 4, 8
+
+
+def heuristics(connectivity):
+    """Names of the heuristics that never overestimate with 4 or 8 moves: manhattan only fits 4."""
+    return HEURISTICS if connectivity == 4 else [name for name in HEURISTICS if name != "manhattan"]
+
+
+class Grid():
+
+    def __init__(self, rows, cols, cells=None, connectivity=4, cutting=CUT_NONE):
+        self.rows = rows
+        self.cols = cols
+
+        if cells is None:
+            cells = bytearray([OPEN]) * (rows * cols)
+        self.cells = cells # terrain cost of every cell, WALL for walls
+        self.components = Components(self) # connected regions, built on first use
+        self.revision = 0 # bumped on every terrain change
+        self.set_moves(connectivity, cutting)
+
+    def set_moves(self, connectivity=4, cutting=CUT_NONE):
+        """Picks 4 or 8 connected moves and the corner cutting of diagonals, and precomputes the
+        moves of every border position so neighbors() is a table lookup."""
+        self.connectivity = connectivity
+        self.cutting = cutting
+
+        self.borders = bytearray(self.rows * self.cols) # TOP/BOTTOM/LEFT/RIGHT bits of every cell
+        for row in range(self.rows):
+            line = bytearray([(TOP if row == 0 else 0) | (BOTTOM if row == self.rows - 1 else 0)]) * self.cols
+            line[0] |= LEFT
+            line[-1] |= RIGHT
+            self.borders[row * self.cols:(row + 1) * self.cols] = line
+
+        # Per border bits: [(offset, side offset, other side offset), ...]; straight moves (and
+        # diagonals allowed to squeeze) check the cell itself as both sides, which is open
+        self.moves = [list() for borders in range(16)]
+        for borders, moves in enumerate(self.moves):
+            for d_row, d_col in MOVES[:connectivity]:
+                if ((d_row == -1 and borders & TOP) or (d_row == 1 and borders & BOTTOM)
+                        or (d_col == -1 and borders & LEFT) or (d_col == 1 and borders & RIGHT)):
+                    continue
+
+                if d_row and d_col and cutting != CUT_BOTH:
+                    moves.append((d_row * self.cols + d_col, d_row * self.cols, d_col))
+                else:
+                    moves.append((d_row * self.cols + d_col, 0, 0))
+        self.offsets = [[offset for offset, side, other in moves] for moves in self.moves]
+
+        self.components.dirty = True
+        self.revision += 1
+
+    def __len__(self):
+        return self.rows * self.cols
+
+    def cell(self, row, col):
+        """Cell id of a row and column."""
+        return row * self.cols + col
+
+    def row_col(self, cell):
+        """Row and column of a cell id."""
+        return divmod(cell, self.cols)
+
+    def is_wall(self, cell):
+        return self.cells[cell] == WALL
+
+    def is_water(self, cell):
+        return self.cells[cell] == WATER
+
+    def set_terrain(self, cell, terrain):
+        """Sets a cell to WALL, OPEN or WATER."""
+        old = self.cells[cell]
+        if old == terrain:
+            return
+
+        self.cells[cell] = terrain
+        self.revision += 1
+
+        if old == WALL and terrain != WALL:
+            self.components.wall_removed(cell)
+        elif old != WALL and terrain == WALL:
+            self.components.wall_added(cell)
+
+    def connected(self, a, b):
+        """Checks if there is any path between two cells."""
+        return a == b or self.components.connected(a, b)
+
+    def has_water(self):
+        return self.cells.find(bytes([WATER])) != -1
+
+    def walls(self):
+        """Cell ids of every wall."""
+        return [match.start() for match in re.finditer(bytes([WALL]), self.cells)] # any buffer, mmap too
+
+    def water(self):
+        """Cell ids of every water cell."""
+        return [match.start() for match in re.finditer(bytes([WATER]), self.cells)]
+
+    def neighbors(self, cell):
+        """Get all the walkable neighbor cells for a specific cell, looking up the moves of its
+        border position instead of checking every side."""
+        cells = self.cells
+        if cells[cell] == WALL:
+            return list()
+
+        if self.connectivity == 4:
+            return [cell + offset for offset in self.offsets[self.borders[cell]] if cells[cell + offset] != WALL]
+
+        if self.cutting == CUT_ONE: # a diagonal needs one of the cells beside it open
+            return [cell + offset for offset, side, other in self.moves[self.borders[cell]]
+                    if cells[cell + offset] != WALL and (cells[cell + side] != WALL or cells[cell + other] != WALL)]
+        return [cell + offset for offset, side, other in self.moves[self.borders[cell]]
+                if cells[cell + offset] != WALL and cells[cell + side] != WALL and cells[cell + other] != WALL]
+
+    def cost(self, cell):
+        """Cost of stepping onto a cell."""
+        return self.cells[cell]
+
+    def step_cost(self, cell, next_cell):
+        """Cost of the move from cell onto next_cell, more for a diagonal one."""
+        if self.connectivity == 4 or cell // self.cols == next_cell // self.cols or cell % self.cols == next_cell % self.cols:
+            return self.cells[next_cell]
+        return DIAGONAL[self.cells[next_cell]]
+
+    def heuristic(self, cell, target):
+        """Estimated cost from cell to target, scaled to the cheapest step: the manhattan distance
+        with 4 moves, the octile distance with 8."""
+        if self.connectivity == 4:
+            return self.manhattan(cell, target)
+        return self.octile(cell, target)
+
+    def estimate(self, name=None):
+        """Heuristic function (cell, target) by name, heuristic() if None. Manhattan overestimates
+        with 8 moves; octile, euclidean and chebyshev never do (see heuristics())."""
+        return self.heuristic if name is None else getattr(self, name)
+
+    def manhattan(self, cell, target):
+        row, col = divmod(cell, self.cols)
+        target_row, target_col = divmod(target, self.cols)
+        return (abs(row - target_row) + abs(col - target_col)) * OPEN
+
+    def octile(self, cell, target):
+        row, col = divmod(cell, self.cols)
+        target_row, target_col = divmod(target, self.cols)
+        d_row, d_col = abs(row - target_row), abs(col - target_col)
+        return max(d_row, d_col) * OPEN + min(d_row, d_col) * (DIAGONAL[OPEN] - OPEN)
+
+    def euclidean(self, cell, target):
+        row, col = divmod(cell, self.cols)
+        target_row, target_col = divmod(target, self.cols)
+        return math.hypot(row - target_row, col - target_col) * OPEN
+
+    def chebyshev(self, cell, target):
+        row, col = divmod(cell, self.cols)
+        target_row, target_col = divmod(target, self.cols)
+        return max(abs(row - target_row), abs(col - target_col)) * OPEN
+
+
+class Components():
+    """Labels every open cell with the connected region it belongs to, so cells in different
+    regions are known to have no path between them without searching. Labels are joined with
+    union-find when a wall is erased; a new wall that may split a region marks the labels dirty
+    and they are rebuilt on the next question."""
+    RUNS = re.compile(rb"[^\x00]+") # stretches of open cells in a row
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.labels = None # region label of every cell, -1 for walls
+        self.parent = list() # union-find over labels
+        self.dirty = True
+
+    def find(self, label):
+        """Root label of the region, halving the path on the way."""
+        parent = self.parent
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+        return label
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[b] = a
+
+    def rebuild(self):
+        """Labels the regions row by row: every run of open cells gets a label, joined with the
+        runs it touches in the row above."""
+        grid = self.grid
+        self.parent = list()
+        runs = list() # (first cell, last cell + 1, label)
+        squeeze = 1 if grid.connectivity == 8 and grid.cutting == CUT_BOTH else 0 # diagonal touches count too
+        above = list()
+
+        for row in range(grid.rows):
+            start = row * grid.cols
+            current = list()
+            i = 0 # first run of the row above that could still touch
+
+            for match in self.RUNS.finditer(grid.cells, start, start + grid.cols):
+                a, b = match.span()
+                label = len(self.parent)
+                self.parent.append(label)
+
+                while i < len(above) and above[i][1] <= a - grid.cols - squeeze:
+                    i += 1
+                j = i
+                while j < len(above) and above[j][0] < b - grid.cols + squeeze:
+                    self.union(above[j][2], label)
+                    j += 1
+
+                current.append((a, b, label))
+
+            runs.extend(current)
+            above = current
+
+        self.labels = array('i', [-1]) * len(grid)
+        for a, b, label in runs:
+            self.labels[a:b] = array('i', [self.find(label)]) * (b - a)
+
+        self.dirty = False
+
+    def connected(self, a, b):
+        if self.dirty:
+            self.rebuild()
+
+        if self.labels[a] == -1 or self.labels[b] == -1:
+            return False
+        return self.find(self.labels[a]) == self.find(self.labels[b])
+
+    def wall_removed(self, cell):
+        """The cell joins the regions of its open neighbors."""
+        if self.dirty:
+            return
+
+        label = len(self.parent)
+        self.parent.append(label)
+        self.labels[cell] = label
+
+        for next_cell in self.grid.neighbors(cell):
+            self.union(label, self.labels[next_cell])
+
+    def wall_added(self, cell):
+        """The cell leaves its region, which only needs a rebuild if the wall could split it."""
+        if self.dirty:
+            return
+
+        self.labels[cell] = -1
+        if self.splits(cell) or (self.grid.connectivity == 8 and self.grid.cutting == CUT_BOTH):
+            self.dirty = True
+
+    def splits(self, cell):
+        """Checks if a wall on cell may cut its region in two: its open sides are not all joined
+        through the open corners around it."""
+        grid = self.grid
+        row, col = grid.row_col(cell)
+
+        def walkable(r, c):
+            return 0 <= r < grid.rows and 0 <= c < grid.cols and grid.cells[r * grid.cols + c] != WALL
+
+        sides = [walkable(row - 1, col), walkable(row, col + 1), walkable(row + 1, col), walkable(row, col - 1)]
+        corners = [walkable(row - 1, col + 1), walkable(row + 1, col + 1), walkable(row + 1, col - 1), walkable(row - 1, col - 1)]
+
+        groups = 0
+        for i in range(4): # a side starts a new group unless the corner before it joins the previous side
+            if sides[i] and not (sides[i - 1] and corners[i - 1]):
+                groups += 1
+
+        return groups > 1
+
+
+class Geometry():
+    """Where the grid sits on screen: rows, columns, cell size in pixels and its top left corner."""
+
+    def __init__(self, rows=20, cols=20, cell_size=20, origin=(50, 20)):
+        self.rows = rows
+        self.cols = cols
+        self.cell_size = cell_size
+        self.x, self.y = origin
+
+    @property
+    def width(self):
+        return self.cols * self.cell_size
+
+    @property
+    def height(self):
+        return self.rows * self.cell_size
+
+    def contains(self, pos):
+        """Checks if a position on screen is on the grid."""
+        return self.x <= pos[0] < self.x + self.width and self.y <= pos[1] < self.y + self.height
+
+    def cell_at(self, pos):
+        """Gets the cell id under a position on the grid."""
+        col = (pos[0] - self.x) // self.cell_size
+        row = (pos[1] - self.y) // self.cell_size
+        return row * self.cols + col
+
+    def pixel(self, cell):
+        """Gets the top left pixel of a cell."""
+        row, col = divmod(cell, self.cols)
+        return (self.x + col * self.cell_size, self.y + row * self.cell_size)
+
+    def rect(self, cell):
+        """Area of a cell inside its grid lines."""
+        x, y = self.pixel(cell)
+        if self.cell_size > 2:
+            return (x + 1, y + 1, self.cell_size - 2, self.cell_size - 2)
+        return (x, y, self.cell_size, self.cell_size)
@@ -0,0 +1,198 @@
+"""
+Maps
+
+Seeded grid.Grid layouts for benchmarks and batch runs: open maps, random walls, mazes and
+maps covered in water. The same kind, size and seed always gives the same map.
+
+Maps are saved in a compact binary format (one terrain byte per cell, memory-mapped on load) or
+as text, one line per row: '.' open, '#' wall, '~' water; Moving AI .map files load as text.
+"""
+import mmap
+import os
+import random
+import struct
+
+from grid import Grid, OPEN, WALL, WATER
+
+
+def open_map(rows, cols, seed=0):
+    """No walls, no water."""
+    return Grid(rows, cols)
+
+
+def random_walls(rows, cols, density, seed=0):
+    """Walls on a random share (density) of the cells."""
+    rng = random.Random(seed)
+    grid = Grid(rows, cols)
+
+    for cell in rng.sample(range(len(grid)), int(len(grid) * density)):
+        grid.cells[cell] = WALL
+
+    return grid
+
+
+def maze(rows, cols, seed=0):
+    """Corridors one cell wide carved by a randomized depth first search from the top left."""
+    rng = random.Random(seed)
+    grid = Grid(rows, cols, bytearray([WALL]) * (rows * cols))
+    grid.cells[0] = OPEN
+    stack = [(0, 0)]
+
+    while stack:
+        row, col = stack[-1]
+        options = [(row + d_row, col + d_col) for d_row, d_col in ((-2, 0), (2, 0), (0, -2), (0, 2))
+                   if 0 <= row + d_row < rows and 0 <= col + d_col < cols
+                   and grid.cells[(row + d_row) * cols + col + d_col] == WALL]
+
+        if not options:
+            stack.pop()
+            continue
+
+        next_row, next_col = rng.choice(options)
+        grid.cells[(row + next_row) // 2 * cols + (col + next_col) // 2] = OPEN # the wall between
+        grid.cells[next_row * cols + next_col] = OPEN
+        stack.append((next_row, next_col))
+
+    return grid
+
+
+def water_heavy(rows, cols, seed=0):
+    """Lakes of water covering about half the map, with a few walls."""
+    rng = random.Random(seed)
+    grid = Grid(rows, cols)
+    lake_size = max(1, min(rows, cols) // 10)
+
+    while grid.cells.count(WATER) < len(grid) // 2:
+        center_row, center_col = rng.randrange(rows), rng.randrange(cols)
+        for row in range(max(0, center_row - lake_size), min(rows, center_row + lake_size + 1)):
+            for col in range(max(0, center_col - lake_size), min(cols, center_col + lake_size + 1)):
+                grid.cells[row * cols + col] = WATER
+
+    for cell in rng.sample(range(len(grid)), len(grid) // 20):
+        grid.cells[cell] = WALL
+
+    return grid
+
+
+# Map kinds by name, each a function of (rows, cols, seed)
+KINDS = {
+    "open": open_map,
+    "walls-10": lambda rows, cols, seed=0: random_walls(rows, cols, 0.10, seed),
+    "walls-25": lambda rows, cols, seed=0: random_walls(rows, cols, 0.25, seed),
+    "walls-40": lambda rows, cols, seed=0: random_walls(rows, cols, 0.40, seed),
+    "maze": maze,
+    "water": water_heavy,
+}
+
+
+def generate(kind, rows, cols, seed=0):
+    """Builds a map of the named kind."""
+    return KINDS[kind](rows, cols, seed)
+
+
+def random_queries(grid, count, seed=0, tries=1000):
+    """Picks up to count (start, end) pairs of open cells that can reach each other."""
+    rng = random.Random("queries %d" % seed) # a stream of its own, not the one that placed the walls
+    queries = list()
+
+    for i in range(count * tries):
+        if len(queries) == count:
+            break
+
+        start, end = rng.randrange(len(grid)), rng.randrange(len(grid))
+        if start != end and not grid.is_wall(start) and grid.connected(start, end):
+            queries.append((start, end))
+
+    return queries
+
+
+# Text map symbols, the first of each is used when saving. Covers the Moving AI benchmark
+# symbols too: '.'/'G' ground, '@'/'O' out of bounds, 'T' trees, 'S' swamp, 'W' water.
+TEXT_SYMBOLS = {OPEN: ".G", WALL: "#@OT", WATER: "~WS"}
+TEXT_TABLE = bytearray([WALL]) * 256 # symbol byte -> terrain, anything unknown blocks
+for value, symbols in TEXT_SYMBOLS.items():
+    for symbol in symbols:
+        TEXT_TABLE[ord(symbol)] = value
+TEXT_TABLE = bytes(TEXT_TABLE)
+
+MAGIC = b"PFMP"
+VERSION = 1
+# Binary maps are the packed terrain bytes followed by a trailer: magic, version, rows, cols and
+# the start/end pawn cells (-1 when missing). Keeping the cells at offset 0 lets them be mapped
+# with mmap as they are, without parsing.
+TRAILER = struct.Struct("<4sHxxIIii")
+
+
+def load_text(path):
+    """Reads a text map, one line per row. A Moving AI header (type/height/width/map) is skipped."""
+    with open(path) as f:
+        lines = [line.rstrip("\r\n") for line in f]
+
+    if lines and lines[0].startswith("type"): # Moving AI .map header
+        lines = lines[[line.strip() for line in lines].index("map") + 1:]
+    lines = [line for line in lines if line.strip()]
+
+    rows, cols = len(lines), max(len(line) for line in lines)
+    grid = Grid(rows, cols)
+    for row, line in enumerate(lines):
+        grid.cells[row * cols:row * cols + len(line)] = line.encode("latin-1").translate(TEXT_TABLE)
+
+    return grid
+
+
+def save_text(grid, path):
+    """Writes a map as text, one line per row."""
+    symbol = {value: symbols[0] for value, symbols in TEXT_SYMBOLS.items()}
+
+    with open(path, "w") as f:
+        for row in range(grid.rows):
+            cells = grid.cells[row * grid.cols:(row + 1) * grid.cols]
+            f.write("".join(symbol[terrain] for terrain in cells) + "\n")
+
+
+def save_binary(grid, path, start=None, end=None):
+    """Writes a map in the binary format, with the pawns if given. The old file is replaced only
+    once the new one is complete, so a grid still mapped from it keeps working."""
+    with open(path + ".tmp", "wb") as f:
+        f.write(grid.cells[:len(grid)])
+        f.write(TRAILER.pack(MAGIC, VERSION, grid.rows, grid.cols,
+                             -1 if start is None else start, -1 if end is None else end))
+    os.replace(path + ".tmp", path)
+
+
+def read_trailer(path):
+    """Rows, cols, start and end of a binary map, or None if the file isn't one."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() < TRAILER.size:
+            return None
+        f.seek(-TRAILER.size, os.SEEK_END)
+        magic, version, rows, cols, start, end = TRAILER.unpack(f.read(TRAILER.size))
+
+        if magic != MAGIC or f.tell() != rows * cols + TRAILER.size:
+            return None
+        if version != VERSION:
+            raise ValueError("unsupported map version %d in %s" % (version, path))
+
+    return rows, cols, (None if start == -1 else start), (None if end == -1 else end)
+
+
+def load_binary(path, writable=True):
+    """Opens a binary map with its cells memory-mapped, returns (grid, start, end). Writable maps
+    are copy on write: edits stay in memory and never reach the file."""
+    header = read_trailer(path)
+    if header is None:
+        raise ValueError("%s is not a binary map" % path)
+    rows, cols, start, end = header
+
+    with open(path, "rb") as f:
+        cells = mmap.mmap(f.fileno(), rows * cols, access=mmap.ACCESS_COPY if writable else mmap.ACCESS_READ)
+
+    return Grid(rows, cols, cells), start, end
+
+
+def load(path, writable=True):
+    """Opens a binary or text map, returns (grid, start, end); text maps have no pawns."""
+    if read_trailer(path) is not None:
+        return load_binary(path, writable)
+    return load_text(path), None, None
@@ -1,13 +1,15 @@
 """
 Pathfinder Class
 
-Run the board, scan the board using the algorithm chosen by the user.
+Run the board, scan the board using the algorithm chosen by the user and draw what the search engine found.
 """
-import math
-import pygame
 import random
+import time
 
-from utils import PriorityQue
+import search
+import stats
+import wavefront
+from grid import CUT_NONE, Grid
 
 
 class Pathfinder():
@@ -17,209 +19,204 @@ class Pathfinder():
     GREY = (157,161,158)
     GREEN = (33,235,80)
     LIGHT_BLUE = (119,226,247)
-
-    def __init__(self, grid, screen):
-        self.start_pawn = None
-        self.end_pawn = None
-        self.grid = grid
-        self.screen = screen
-        self.walls = list()
-        self.water = list()
-
-        self.que = PriorityQue() # list
-
-        self.end_pawn = random.choice(self.grid)
-        self.start_pawn = self.assign_start_pawn_location()
-
-        self.color_single_cell(self.RED, self.end_pawn[0], self.end_pawn[1])
-        self.color_single_cell(self.BLUE, self.start_pawn[0], self.start_pawn[1])
-
-    def assign_start_pawn_location(self):
-        """Picks a location for start pawn."""
-        while True:
-            start = random.choice(self.grid)
-
-            if start != self.end_pawn:
-                return start
-
-    def color_single_cell(self, color, x, y):
+    PURPLE = (127,15,168)
+    BLACK = (0,0,0)
+    HEAT_NEAR = (255,230,120) # heatmap color next to the start pawn
+    HEAT_FAR = (150,20,60) # heatmap color of the farthest cell
+
+    def __init__(self, renderer, cache_size=128, stats_enabled=False, stats_file=None,
+                 terrain=None, start_pawn=None, end_pawn=None, weight=search.WEIGHT,
+                 cluster_size=search.CLUSTER_SIZE, connectivity=4, cutting=CUT_NONE, heuristic=None):
+        self.start_pawn = None # cell id
+        self.end_pawn = None # cell id
+        self.renderer = renderer # draws the cells
+        self.terrain = terrain if terrain is not None else Grid(renderer.geometry.rows, renderer.geometry.cols) # walls and water
+        self.terrain.set_moves(connectivity, cutting) # 4 or 8 neighbors, corner cutting of diagonals
+        self.steps = None # running search generator
+        self.cache = search.SearchCache(cache_size) # finished searches, replayed on repeat clicks
+        self.stats_enabled = stats_enabled # instrument the searches
+        self.stats_file = stats_file # where finished search stats are appended
+        self.stats = None # stats.SearchStats of the running or last search
+        self.planner = None # search.DStarLite kept between runs, repairs its path after edits
+        self.replanning = False # last search was the planner, edits replan right away
+        self.drawn_path = list() # cells of the last path drawn
+        self.weight = weight # heuristic weight of weighted A* and the first ARA* pass
+        self.anytime = None # search.AnytimeAStar of the running or last ARA* search, has its bound
+        self.cluster_size = cluster_size # cluster side of HPA*
+        self.hierarchy = None # search.Hierarchy of the terrain, made by the first HPA* search
+        self.heuristic = heuristic # name of the grid heuristic A* and friends use, the grid's default if None
+
+        for cell in self.terrain.walls(): # a loaded map
+            self.color_single_cell(self.PURPLE, cell)
+        for cell in self.terrain.water():
+            self.color_single_cell(self.LIGHT_BLUE, cell)
+
+        self.end_pawn = end_pawn if end_pawn is not None else self.assign_pawn_location()
+        self.start_pawn = start_pawn if start_pawn is not None else self.assign_pawn_location()
+
+        if self.end_pawn is not None:
+            self.color_single_cell(self.RED, self.end_pawn)
+        if self.start_pawn is not None:
+            self.color_single_cell(self.BLUE, self.start_pawn)
+
+    def assign_pawn_location(self):
+        """Picks a free location for a pawn, None if there's none left."""
+        for tries in range(1000):
+            cell = random.randrange(len(self.terrain))
+
+            if cell != self.end_pawn and not self.terrain.is_wall(cell):
+                return cell
+
+    def color_single_cell(self, color, cell):
         """Draws a perfect cell on the grid."""
-        pygame.draw.rect(self.screen, color, (x + 1, y + 1, 18, 18), 0)
-        pygame.display.update()
-
-    def get_neighbors(self, node):
-        """Get all the neighbor cells for a specific node."""
-        neighbors = list()
-
-        if not node in self.walls:
-            if node[0] - 20 >= 50:
-                neighbors.append((node[0] - 20, node[1])) # checks the left neighbor node
-            if node[0] + 20 <= 430:
-                neighbors.append((node[0] + 20, node[1])) # checks the right neighbor node
-            if node[1] - 20 >= 20:
-                neighbors.append((node[0], node[1] - 20)) # checks the upward neighbor node
-            if node[1] + 20 <= 400:
-                neighbors.append((node[0], node[1] + 20)) # checks the downward neighbor node
-
-        return neighbors
-
-    def reconstructed_path(self, came_from):
-        """Rebuilds the path of the dictionary."""
-        path = list()
-        current = self.end_pawn
-
-        while current != self.start_pawn: # Checks if the node is start pawn
-            path.append(current)
-            current = came_from[current] # Gets the previous node it came from
-
-        path.append(self.start_pawn)
-        path.reverse()
-
-        if path[0] == self.start_pawn:
-            if self.water:
-                for aqua in self.water: # Re-color the water
-                    self.color_single_cell(self.LIGHT_BLUE, aqua[0], aqua[1])
-
-            for node in path: # Color the most efficient path
-                if node != self.start_pawn and node != self.end_pawn:
-                    self.color_single_cell(self.GREEN, node[0], node[1])
-
-    def bfs(self):
-        """Runs the Breadth First Search, rebuilds path when end location found."""
-        q = list() # Que list
-        q.append(self.start_pawn)
-
-        came_from = dict() # Dict holding the node and it's previous node
-        came_from[self.start_pawn] = None
-
-        while q:
-            ev = pygame.event.poll() # will cancel loop
-            if ev.type == pygame.QUIT or ev.type == pygame.KEYDOWN:
+        self.renderer.color_cell(color, cell)
+
+    @property
+    def searching(self):
+        return self.steps is not None
+
+    def start_search(self, name):
+        """Starts drawing the named search (served by the cache if it ran before), advance() moves
+        it along. With stats enabled the search is instrumented."""
+        self.stats = stats.SearchStats(name) if self.stats_enabled else None
+        self.replanning = name == "d_star_lite"
+        self.anytime = None
+        terrain = self.terrain if self.stats is None else stats.TimedGrid(self.terrain, self.stats)
+
+        if self.replanning: # its state is worth more than any cached result
+            if self.planner is None or self.planner.end != self.end_pawn:
+                self.planner = search.DStarLite(self.terrain, self.start_pawn, self.end_pawn)
+            self.planner.grid = terrain # neighbor calls of this run go to its stats
+            steps = self.planner.steps(self.start_pawn, self.stats)
+        elif name == "hpa_star": # the hierarchy keeps itself up to date with the terrain
+            if self.hierarchy is None:
+                self.hierarchy = search.Hierarchy(self.terrain, self.cluster_size)
+            self.hierarchy.grid = terrain # neighbor calls of this run go to its stats
+            steps = self.hierarchy.steps(self.start_pawn, self.end_pawn, self.stats)
+        elif name == "ara_star": # not cached, a replay would only show the last path and bound
+            self.anytime = search.AnytimeAStar(terrain, self.start_pawn, self.end_pawn, self.weight,
+                                               heuristic=self.heuristic)
+            steps = self.anytime.steps(self.stats)
+        else:
+            options = {"weight": self.weight} if name == "weighted_a_star" else {}
+            if name in search.HEURISTIC_ALGORITHMS and self.heuristic is not None:
+                options["heuristic"] = self.heuristic
+            steps = self.cache.steps(name, terrain, self.start_pawn, self.end_pawn, self.stats, **options)
+
+        self.steps = steps if self.stats is None else stats.instrumented_steps(steps, self.stats)
+
+    def cancel_search(self):
+        """Drops the running search, cells already drawn stay on the board."""
+        self.steps = None
+
+    def board_changed(self):
+        """Terrain or a pawn changed: drops the running search, or repairs the path right away if
+        the last search was the D* Lite planner."""
+        self.cancel_search()
+        if self.replanning and self.start_pawn is not None and self.end_pawn is not None:
+            self.start_search("d_star_lite")
+
+    def advance(self, count=None):
+        """Draws up to count events of the running search, all of them if count is None."""
+        drawn = 0
+        finished = False
+        if self.stats is not None:
+            began, searched = time.perf_counter(), self.stats.search_time
+
+        while self.steps is not None and (count is None or drawn < count):
+            try:
+                kind, value = next(self.steps)
+            except StopIteration:
+                self.steps = None
+                finished = True
                 break
 
-            current_node = q.pop(0) # Deque the first node
-
-            if current_node == self.end_pawn:
-                self.reconstructed_path(came_from)
-                break
-
-            if current_node != self.start_pawn and not current_node in self.walls:
-                self.color_single_cell(self.GREY, current_node[0], current_node[1])
-
-            for next_node in self.get_neighbors(current_node):
-                if not next_node in came_from: # Adds the node to the que
-                    q.append(next_node)
-                    came_from[next_node] = current_node
+            drawn += 1
+            if kind == search.FOUND:
+                self.reconstructed_path(value)
+            elif value == self.start_pawn or value == self.end_pawn:
+                continue
+            elif kind == search.CLOSE:
+                self.color_single_cell(self.GREY, value)
+            else:
+                self.color_single_cell(self.PINK, value)
+
+        if self.stats is not None: # whatever time the search itself didn't take went to drawing
+            self.stats.render_time += time.perf_counter() - began - (self.stats.search_time - searched)
+            if finished and self.stats_file:
+                stats.dump([self.stats], self.stats_file)
+
+    def heatmap(self):
+        """Colors every cell the start pawn can reach by its distance (NumPy wavefront), then the
+        shortest path to the end pawn."""
+        self.cancel_search()
+        self.replanning = False
+        self.anytime = None
+        dist, path = wavefront.wavefront(self.terrain, self.start_pawn, self.end_pawn)
+        farthest = max(int(dist.max()), 1)
+
+        for cell, steps in enumerate(dist.tolist()):
+            if steps > 0 and cell != self.end_pawn:
+                share = steps / farthest
+                color = tuple(int(near + (far - near) * share) for near, far in zip(self.HEAT_NEAR, self.HEAT_FAR))
+                self.color_single_cell(color, cell)
+
+        if path:
+            self.reconstructed_path(path)
+
+    def reconstructed_path(self, path):
+        """Colors the most efficient path found by the search, clearing what is left of the last one."""
+        for cell in set(self.drawn_path).difference(path, (self.start_pawn, self.end_pawn)):
+            self.color_single_cell(self.PURPLE if self.terrain.is_wall(cell) else self.BLACK, cell)
+        self.drawn_path = path
+
+        for aqua in self.terrain.water(): # Re-color the water
+            self.color_single_cell(self.LIGHT_BLUE, aqua)
+
+        for cell in path: # Color the most efficient path
+            if cell != self.start_pawn and cell != self.end_pawn:
+                self.color_single_cell(self.GREEN, cell)
 
-                    if next_node != self.end_pawn and not next_node in self.walls:
-                        self.color_single_cell(self.PINK, next_node[0], next_node[1])
+    def bfs(self):
+        """Starts the Breadth First Search."""
+        self.start_search("bfs")
 
     def dijkstra(self):
-        """Runs the Dijkstra search, rebuilds path when end location found."""
-        self.que.enque(self.start_pawn, 0) # Priority que adds to que
-
-        came_from = dict() # Dict holding the node and it's pervious node
-        cost_so_far = dict() # Dict holding the node and it's cost to get there
-        came_from[self.start_pawn] = None
-        cost_so_far[self.start_pawn] = 0
-
-        while self.que.wait_list:
-            ev = pygame.event.poll() # will cancel loop
-            if ev.type == pygame.QUIT or ev.type == pygame.KEYDOWN:
-                break
-
-            current_node = self.que.deque() # gets the lowest costly node
-
-            if current_node == self.end_pawn:
-                self.reconstructed_path(came_from)
-                break
-
-            if current_node != self.start_pawn and not current_node in self.walls:
-                self.color_single_cell(self.GREY, current_node[0], current_node[1])
-
-            for next_node in self.get_neighbors(current_node):
-                if next_node in self.water: # Set the cost of getting to the node
-                    new_cost = cost_so_far[current_node] + 70
-                else:
-                    new_cost = cost_so_far[current_node] + 20
-
-                if not next_node in cost_so_far or new_cost < cost_so_far[next_node]:
-                    cost_so_far[next_node] = new_cost # Save the node and its new cost
-                    self.que.enque(next_node, new_cost)
-                    came_from[next_node] = current_node
-
-                    if next_node != self.end_pawn and not next_node in self.walls:
-                        self.color_single_cell(self.PINK, next_node[0], next_node[1])
-
-    def heuristic(self, node):
-        """Uses the manhattan distance of target pawn and node."""
-        #return math.sqrt((self.end_pawn[0] - node[0])**2 + (self.end_pawn[1] - node[1])**2)
-        return abs(node[0] - self.end_pawn[0]) + abs(node[1] - self.end_pawn[1]) # |x1 - x2| + |y1 - y2|
+        """Starts the Dijkstra search."""
+        self.start_search("dijkstra")
 
     def greedy(self):
-        """Runs the greedy search, rebuilds path when end location found."""
-        self.que.enque(self.start_pawn, 0) # Priority que adds to que
-
-        came_from = dict() # Dict holding the node and it's pervious node
-        came_from[self.start_pawn] = None
-
-        while self.que.wait_list:
-            ev = pygame.event.poll() # will cancel loop
-            if ev.type == pygame.QUIT or ev.type == pygame.KEYDOWN:
-                break
-
-            current_node = self.que.deque() # gets the lowest costly node, returns a sublist [(grid loc), cost]
-
-            if current_node == self.end_pawn:
-                self.reconstructed_path(came_from)
-                break
-
-            if current_node != self.start_pawn and not current_node in self.walls:
-                self.color_single_cell(self.GREY, current_node[0], current_node[1])
-
-            for next_node in self.get_neighbors(current_node):
-                if not next_node in came_from:
-                    priority = self.heuristic(next_node) # Gets the manhattan distance
-                    self.que.enque(next_node, priority)      # of the node.
-                    came_from[next_node] = current_node
-
-                    if next_node != self.end_pawn and not next_node in self.walls:
-                        self.color_single_cell(self.PINK, next_node[0], next_node[1])
+        """Starts the greedy search."""
+        self.start_search("greedy")
 
     def a_star(self):
-        """Runs the A* search, rebuilds path when end location found."""
-        self.que.enque(self.start_pawn, 0) # Priority que adds to que
-
-        came_from = dict() # dict holding the node and it's pervious node
-        cost_so_far = dict() # dict holding the node and it's cost to get there
-        came_from[self.start_pawn] = None
-        cost_so_far[self.start_pawn] = 0
+        """Starts the A* search."""
+        self.start_search("a_star")
 
-        while self.que.wait_list:
-            ev = pygame.event.poll() # will cancel loop
-            if ev.type == pygame.QUIT or ev.type == pygame.KEYDOWN:
-                break
+    def weighted_a_star(self):
+        """Starts the weighted A* search."""
+        self.start_search("weighted_a_star")
 
-            current_node = self.que.deque() # Gets lowest costly node
+    def ara_star(self):
+        """Starts ARA*, which draws every better path it finds."""
+        self.start_search("ara_star")
 
-            if current_node == self.end_pawn:
-                self.reconstructed_path(came_from)
-                break
+    def hpa_star(self):
+        """Starts HPA*, the drawn events are those of the search over cluster entrances."""
+        self.start_search("hpa_star")
 
-            if current_node != self.start_pawn and not current_node in self.walls:
-                self.color_single_cell(self.GREY, current_node[0], current_node[1])
+    def jps(self):
+        """Starts the Jump Point Search."""
+        self.start_search("jps")
 
-            for next_node in self.get_neighbors(current_node):
-                if next_node in self.water: # Sets the cost of getting to the node
-                    new_cost = cost_so_far[current_node] + 70
-                else:
-                    new_cost = cost_so_far[current_node] + 20
+    def bidirectional_dijkstra(self):
+        """Starts the bidirectional Dijkstra search."""
+        self.start_search("bidirectional_dijkstra")
 
-                if not next_node in cost_so_far or new_cost < cost_so_far[next_node]:
-                    cost_so_far[next_node] = new_cost # Save the new cost of node
-                    priority = new_cost + self.heuristic(next_node) # Will combine cost and manhattan distance of that node
-                    self.que.enque(next_node, priority)
-                    came_from[next_node] = current_node
+    def bidirectional_a_star(self):
+        """Starts the bidirectional A* search."""
+        self.start_search("bidirectional_a_star")
 
-                    if next_node != self.end_pawn and not next_node in self.walls:
-                        self.color_single_cell(self.PINK, next_node[0], next_node[1])
+    def d_star_lite(self):
+        """Starts the D* Lite planner, which later edits only repair."""
+        self.start_search("d_star_lite")
@@ -0,0 +1,73 @@
+"""
+Renderer Class
+
+Draws cells onto the screen but only pushes the changed areas (dirty rects) to the display
+once per frame, instead of flipping the whole screen after every rectangle.
+"""
+import pygame
+import time
+
+
+class Renderer():
+    FPS = 60
+    MAX_DIRTY = 400 # past this many rects a full display update is cheaper
+
+    # Animation speeds, as search events drawn per frame (None draws everything in one frame)
+    SPEEDS = [("Slow", 1), ("Normal", 8), ("Fast", 64), ("Instant", None)]
+
+    def __init__(self, screen, geometry):
+        self.screen = screen
+        self.geometry = geometry
+        self.dirty = list() # rects changed since the last flush
+        self.speed_index = 1
+        self.clock = pygame.time.Clock()
+        self.flush_time = 0.0 # seconds the last flush took
+
+    @property
+    def speed_name(self):
+        return self.SPEEDS[self.speed_index][0]
+
+    @property
+    def speed(self):
+        return self.SPEEDS[self.speed_index][1]
+
+    def next_speed(self):
+        """Cycles to the next animation speed."""
+        self.speed_index = (self.speed_index + 1) % len(self.SPEEDS)
+
+    def draw_grid(self, surface, color):
+        """Draws the cell borders onto surface, one line per row and column border."""
+        g = self.geometry
+        if g.cell_size <= 2: # lines would cover tiny cells completely
+            return
+
+        for row in range(g.rows + 1):
+            y = g.y + row * g.cell_size
+            pygame.draw.line(surface, color, (g.x, y), (g.x + g.width, y))
+        for col in range(g.cols + 1):
+            x = g.x + col * g.cell_size
+            pygame.draw.line(surface, color, (x, g.y), (x, g.y + g.height))
+
+    def color_cell(self, color, cell):
+        """Colors in a perfect rect inbetween a grid cell, shown on the next flush."""
+        self.dirty.append(pygame.draw.rect(self.screen, color, self.geometry.rect(cell), 0))
+
+    def mark(self, rect):
+        """Adds an area drawn outside the renderer to the next flush."""
+        self.dirty.append(rect)
+
+    def flush(self):
+        """Pushes every dirty rect to the display."""
+        began = time.perf_counter()
+        if len(self.dirty) > self.MAX_DIRTY:
+            pygame.display.update()
+        elif self.dirty:
+            pygame.display.update(self.dirty)
+
+        self.dirty = list()
+        self.flush_time = time.perf_counter() - began
+
+    def end_frame(self):
+        """Flushes and waits out the rest of the frame."""
+        self.flush()
+        self.clock.tick(self.FPS)
@@ -0,0 +1,1136 @@
+"""
+Search Engine
+
+Grid searches used by the Pathfinding App: Breadth First Search, Dijkstra, Greedy BFS, A*,
+weighted A*, ARA* (anytime A*), Jump Point Search, bidirectional Dijkstra/A*, D* Lite, which
+replans incrementally, and HPA*, which searches an abstraction of the grid made of clusters.
+Searches run over a grid.Grid using integer cell ids. Nothing in here touches pygame, so the
+searches can run without a window (tests, batch jobs) and the GUI only draws their events.
+They move the way the grid does, to 4 or 8 neighbors, and pay grid.step_cost() for every move.
+
+Every algorithm comes in two forms: *_steps() is a generator yielding (OPEN, node), (CLOSE, node)
+and finally (FOUND, path) events, and returns the path cost; the plain function runs it to the
+end and returns a SearchResult. The *_steps() generators take an optional stats.SearchStats
+that their PriorityQue counts heap pushes and stale pops into. SearchCache keeps finished results until the grid changes.
+"""
+import heapq
+import weakref
+from collections import OrderedDict
+
+from grid import CUT_BOTH, OPEN as OPEN_COST, WALL
+
+OPEN = "open" # node was added to the frontier
+CLOSE = "close" # node was taken off the frontier and expanded
+FOUND = "found" # last event of a successful search, carries the path
+
+
+class PriorityQue():
+    """Binary heap of nodes. Equal priorities come out first in first out and re-queuing a node
+    updates its priority, leaving the old heap entry behind as stale (lazy deletion)."""
+    REMOVED = object() # marks a stale heap entry
+
+    def __init__(self, stats=None):
+        self.heap = list() # [[priority, order, node], ...]
+        self.entries = dict() # node -> its live heap entry
+        self.order = 0 # insertion counter, keeps ties stable
+        self.stats = stats # optional stats.SearchStats counting pushes and stale pops
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, node):
+        return node in self.entries
+
+    def top_priority(self):
+        """Priority of the node deque() would return next."""
+        while self.heap[0][-1] is self.REMOVED:
+            heapq.heappop(self.heap)
+            if self.stats is not None:
+                self.stats.stale_pops += 1
+        return self.heap[0][0]
+
+    def deque(self):
+        """Pops the most prioritized node, skipping stale entries."""
+        while self.heap:
+            priority, order, node = heapq.heappop(self.heap)
+            if node is not self.REMOVED:
+                del self.entries[node]
+                return node
+            if self.stats is not None:
+                self.stats.stale_pops += 1
+
+        raise IndexError("deque from an empty PriorityQue")
+
+    def enque(self, node, priority):
+        """Adds node to the heap, or updates its priority if it is already waiting."""
+        if node in self.entries:
+            self.entries[node][-1] = self.REMOVED
+
+        entry = [priority, self.order, node]
+        self.order += 1
+        self.entries[node] = entry
+        heapq.heappush(self.heap, entry)
+        if self.stats is not None:
+            self.stats.pushes += 1
+
+    def remove(self, node):
+        """Takes node off the que if it is waiting, its heap entry goes stale."""
+        entry = self.entries.pop(node, None)
+        if entry is not None:
+            entry[-1] = self.REMOVED
+
+
+class SearchResult():
+    """Outcome of a search: the path found (empty if none), its cost and the order nodes were visited."""
+
+    def __init__(self, path, cost, events):
+        self.path = path
+        self.cost = cost
+        self.events = events # [(OPEN or CLOSE, node), ...] in the order they happened, None if not kept
+
+    @property
+    def found(self):
+        return bool(self.path)
+
+    @property
+    def visited(self):
+        """Nodes in the order they were expanded, None if the events were not kept."""
+        if self.events is None:
+            return None
+        return [node for kind, node in self.events if kind == CLOSE]
+
+
+def reconstructed_path(came_from, start, end):
+    """Rebuilds the path from start to end out of the came_from dictionary."""
+    path = list()
+    current = end
+
+    while current != start: # Checks if the node is start
+        path.append(current)
+        current = came_from[current] # Gets the previous node it came from
+
+    path.append(start)
+    path.reverse()
+
+    return path
+
+
+def joined_path(came_from, came_to, start, meet, end):
+    """Rebuilds the path of a two sided search: start to meet out of came_from, then meet to end
+    out of came_to, the dictionary of the search that started from end."""
+    path = reconstructed_path(came_from, start, meet)
+    current = meet
+
+    while current != end:
+        current = came_to[current] # Gets the next node towards end
+        path.append(current)
+
+    return path
+
+
+def path_cost(grid, path):
+    """Sums the cost of every move along the path."""
+    return sum(grid.step_cost(node, next_node) for node, next_node in zip(path, path[1:]))
+
+
+def recorded_steps(steps, done):
+    """Passes the events of a search generator along and hands done() the SearchResult once the
+    search is over."""
+    events = list()
+    path = list()
+
+    while True:
+        try:
+            kind, value = next(steps)
+        except StopIteration as stop:
+            done(SearchResult(path, stop.value, events))
+            return stop.value
+
+        if kind == FOUND:
+            path = value
+        else:
+            events.append((kind, value))
+        yield kind, value
+
+
+def replayed_steps(result):
+    """Yields the events of a finished search again, like the generator that produced it. Without
+    its events only the path is yielded."""
+    yield from result.events or ()
+    if result.found:
+        yield FOUND, result.path
+    return result.cost
+
+
+def run(steps):
+    """Drives a search generator to the end and collects its events into a SearchResult."""
+    results = list()
+    for event in recorded_steps(steps, results.append):
+        pass
+
+    return results[0]
+
+
+def bfs_steps(grid, start, end, stats=None):
+    """Runs the Breadth First Search, rebuilds path when end location found."""
+    if not grid.connected(start, end): # Walls keep them apart, no need to search
+        return None
+
+    q = list() # Que list
+    q.append(start)
+
+    came_from = dict() # Dict holding the node and it's previous node
+    came_from[start] = None
+
+    while q:
+        current_node = q.pop(0) # Deque the first node
+        yield CLOSE, current_node
+
+        if current_node == end:
+            path = reconstructed_path(came_from, start, end)
+            yield FOUND, path
+            return path_cost(grid, path)
+
+        for next_node in grid.neighbors(current_node):
+            if not next_node in came_from: # Adds the node to the que
+                q.append(next_node)
+                came_from[next_node] = current_node
+                yield OPEN, next_node
+
+
+def dijkstra_steps(grid, start, end, stats=None):
+    """Runs the Dijkstra search, rebuilds path when end location found."""
+    if not grid.connected(start, end): # Walls keep them apart, no need to search
+        return None
+
+    que = PriorityQue(stats)
+    que.enque(start, 0) # Priority que adds to que
+
+    came_from = dict() # Dict holding the node and it's pervious node
+    cost_so_far = dict() # Dict holding the node and it's cost to get there
+    came_from[start] = None
+    cost_so_far[start] = 0
+
+    while que:
+        current_node = que.deque() # gets the lowest costly node
+        yield CLOSE, current_node
+
+        if current_node == end:
+            yield FOUND, reconstructed_path(came_from, start, end)
+            return cost_so_far[end]
+
+        for next_node in grid.neighbors(current_node):
+            new_cost = cost_so_far[current_node] + grid.step_cost(current_node, next_node) # Set the cost of getting to the node
+
+            if not next_node in cost_so_far or new_cost < cost_so_far[next_node]:
+                cost_so_far[next_node] = new_cost # Save the node and its new cost
+                que.enque(next_node, new_cost)
+                came_from[next_node] = current_node
+                yield OPEN, next_node
+
+
+def greedy_steps(grid, start, end, stats=None, heuristic=None):
+    """Runs the greedy search, rebuilds path when end location found. heuristic names one of the
+    grid's heuristics (see grid.HEURISTICS), its default one if None."""
+    if not grid.connected(start, end): # Walls keep them apart, no need to search
+        return None
+    estimate = grid.estimate(heuristic)
+
+    que = PriorityQue(stats)
+    que.enque(start, 0) # Priority que adds to que
+
+    came_from = dict() # Dict holding the node and it's pervious node
+    came_from[start] = None
+
+    while que:
+        current_node = que.deque() # gets the node closest to the end
+        yield CLOSE, current_node
+
+        if current_node == end:
+            path = reconstructed_path(came_from, start, end)
+            yield FOUND, path
+            return path_cost(grid, path)
+
+        for next_node in grid.neighbors(current_node):
+            if not next_node in came_from:
+                priority = estimate(next_node, end) # Gets the estimated distance
+                que.enque(next_node, priority)      # of the node.
+                came_from[next_node] = current_node
+                yield OPEN, next_node
+
+
+def a_star_steps(grid, start, end, stats=None, weight=1, heuristic=None):
+    """Runs the A* search, rebuilds path when end location found. A weight above 1 scales the
+    heuristic (weighted A*); heuristic names one of the grid's heuristics, its default if None."""
+    if not grid.connected(start, end): # Walls keep them apart, no need to search
+        return None
+    estimate = grid.estimate(heuristic)
+
+    que = PriorityQue(stats)
+    que.enque(start, 0) # Priority que adds to que
+
+    came_from = dict() # dict holding the node and it's pervious node
+    cost_so_far = dict() # dict holding the node and it's cost to get there
+    came_from[start] = None
+    cost_so_far[start] = 0
+
+    while que:
+        current_node = que.deque() # Gets lowest costly node
+        yield CLOSE, current_node
+
+        if current_node == end:
+            yield FOUND, reconstructed_path(came_from, start, end)
+            return cost_so_far[end]
+
+        for next_node in grid.neighbors(current_node):
+            new_cost = cost_so_far[current_node] + grid.step_cost(current_node, next_node) # Sets the cost of getting to the node
+
+            if not next_node in cost_so_far or new_cost < cost_so_far[next_node]:
+                cost_so_far[next_node] = new_cost # Save the new cost of node
+                priority = new_cost + weight * estimate(next_node, end) # Will combine cost and estimated distance of that node
+                que.enque(next_node, priority)
+                came_from[next_node] = current_node
+                yield OPEN, next_node
+
+
+WEIGHT = 2.0 # default heuristic weight of the weighted and anytime A* searches
+
+
+def weighted_a_star_steps(grid, start, end, stats=None, weight=WEIGHT, heuristic=None):
+    """Runs A* with the heuristic scaled by weight: expands fewer nodes, and the path costs at most
+    weight times the cheapest one."""
+    return (yield from a_star_steps(grid, start, end, stats, weight, heuristic))
+
+
+class AnytimeAStar():
+    """Anytime Repairing A* (ARA*). Finds a first path fast with a heavily weighted heuristic, then
+    lowers the weight step by step, reusing the costs found so far, until the path is optimal.
+    Every better path is yielded as another FOUND event; bound holds how far off the cheapest
+    path the latest one can be (1.0 once it is optimal)."""
+
+    def __init__(self, grid, start, end, weight=WEIGHT, decrease=0.5, heuristic=None):
+        self.grid = grid
+        self.start = start
+        self.end = end
+        self.weight = max(1.0, weight) # weight of the current pass
+        self.decrease = decrease # taken off the weight after every pass
+        self.path = list() # best path so far
+        self.cost = None
+        self.bound = None # cost is at most bound times the cheapest cost
+        self.estimate = grid.estimate(heuristic)
+
+    def steps(self, stats=None):
+        """Search generator with a FOUND event per improved path, returns the final cost."""
+        grid, start, end, estimate = self.grid, self.start, self.end, self.estimate
+        if not grid.connected(start, end): # Walls keep them apart, no need to search
+            return None
+
+        came_from = {start: None}
+        cost_so_far = {start: 0}
+        waiting = [start] # nodes to queue at the start of the next pass
+        inconsistent = list() # got cheaper after this pass expanded them
+
+        while True:
+            que = PriorityQue(stats)
+            for node in waiting:
+                que.enque(node, cost_so_far[node] + self.weight * estimate(node, end))
+            closed = set()
+
+            while que and cost_so_far.get(end, float("inf")) > que.top_priority():
+                current_node = que.deque()
+                closed.add(current_node)
+                yield CLOSE, current_node
+
+                for next_node in grid.neighbors(current_node):
+                    new_cost = cost_so_far[current_node] + grid.step_cost(current_node, next_node)
+
+                    if not next_node in cost_so_far or new_cost < cost_so_far[next_node]:
+                        cost_so_far[next_node] = new_cost
+                        came_from[next_node] = current_node
+                        if next_node in closed: # expanded this pass already, comes back next pass
+                            inconsistent.append(next_node)
+                        else:
+                            que.enque(next_node, new_cost + self.weight * estimate(next_node, end))
+                            yield OPEN, next_node
+
+            waiting = list(que.entries) + inconsistent
+            inconsistent = list()
+            lowest = min((cost_so_far[node] + estimate(node, end) for node in waiting), default=None)
+
+            improved = self.cost is None or cost_so_far[end] < self.cost
+            if improved:
+                self.cost = cost_so_far[end]
+                self.path = reconstructed_path(came_from, start, end)
+            self.bound = 1.0 if not lowest else max(1.0, min(self.weight, self.cost / lowest)) # 0 when start is end
+            if improved:
+                yield FOUND, self.path
+
+            if self.bound <= 1.0:
+                return self.cost
+            self.weight = max(1.0, self.weight - self.decrease)
+
+
+def ara_star_steps(grid, start, end, stats=None, weight=WEIGHT, heuristic=None):
+    """Runs ARA* until its path is optimal."""
+    return (yield from AnytimeAStar(grid, start, end, weight, heuristic=heuristic).steps(stats))
+
+
+WALL_BYTE = bytes([WALL])
+
+
+def scan_row(grid, cell, d_col, end):
+    """Jumps sideways from cell, returns the first jump point before a wall or the border, or None.
+    Walls are looked up with bytearray.find/rfind so the scan runs at C speed."""
+    cells, cols = grid.cells, grid.cols
+    row, col = divmod(cell, cols)
+    row_start = row * cols
+
+    if d_col > 0:
+        wall = cells.find(WALL_BYTE, cell + 1, row_start + cols)
+        limit = (wall if wall != -1 else row_start + cols) - row_start # first column we can't reach
+        best = limit
+        for side in (row - 1, row + 1): # open cell beside us right after a wall: forced neighbor
+            if 0 <= side < grid.rows:
+                side_start = side * cols
+                wall = cells.find(WALL_BYTE, side_start + col, side_start + best - 1)
+                while wall != -1:
+                    if cells[wall + 1] != WALL:
+                        best = wall + 1 - side_start
+                        break
+                    wall = cells.find(WALL_BYTE, wall + 1, side_start + best - 1)
+        if end // cols == row and col < end % cols < best:
+            best = end % cols
+    else:
+        wall = cells.rfind(WALL_BYTE, row_start, cell)
+        limit = (wall if wall != -1 else row_start - 1) - row_start # first column we can't reach
+        best = limit
+        for side in (row - 1, row + 1):
+            if 0 <= side < grid.rows:
+                side_start = side * cols
+                wall = cells.rfind(WALL_BYTE, side_start + best + 2, side_start + col + 1)
+                while wall != -1:
+                    if cells[wall - 1] != WALL:
+                        best = wall - 1 - side_start
+                        break
+                    wall = cells.rfind(WALL_BYTE, side_start + best + 2, wall)
+        if end // cols == row and best < end % cols < col:
+            best = end % cols
+
+    if best == limit:
+        return None
+    return row_start + best
+
+
+def jump(grid, cell, d_row, d_col, end):
+    """Walks from cell in one direction until it reaches a jump point (the end, or a cell with a
+    forced neighbor), returns it or None when a wall or the border comes first."""
+    if d_col:
+        return scan_row(grid, cell, d_col, end)
+
+    rows, cols, cells = grid.rows, grid.cols, grid.cells
+
+    def walkable(r, c):
+        return 0 <= r < rows and 0 <= c < cols and cells[r * cols + c] != WALL
+
+    row, col = divmod(cell, cols)
+    while True: # moving up or down
+        row += d_row
+        if not walkable(row, col):
+            return None
+
+        node = row * cols + col
+        if node == end:
+            return node
+
+        # a wall behind an open cell on either side forces a turn
+        if (walkable(row, col - 1) and not walkable(row - d_row, col - 1)) or \
+           (walkable(row, col + 1) and not walkable(row - d_row, col + 1)):
+            return node
+        # so does anything a sideways jump would find
+        if scan_row(grid, node, 1, end) is not None or scan_row(grid, node, -1, end) is not None:
+            return node
+
+
+def jps_steps(grid, start, end, stats=None):
+    """Runs the Jump Point Search, rebuilds path when end location found. Only expands jump points,
+    which keeps the A* cost on grids where every step costs the same. Water breaks that, so on
+    grids with water it runs A* instead, and so does a grid with diagonal moves: the jumps here
+    only go straight."""
+    if not grid.connected(start, end): # Walls keep them apart, no need to search
+        return None
+
+    if grid.has_water() or grid.connectivity == 8:
+        return (yield from a_star_steps(grid, start, end, stats))
+
+    que = PriorityQue(stats)
+    que.enque(start, 0) # Priority que adds to que
+
+    came_from = dict() # dict holding the jump point and the jump point it came from
+    cost_so_far = dict() # dict holding the jump point and it's cost to get there
+    came_from[start] = None
+    cost_so_far[start] = 0
+
+    while que:
+        current_node = que.deque() # Gets lowest costly jump point
+        yield CLOSE, current_node
+
+        if current_node == end:
+            yield FOUND, straight_path(grid, reconstructed_path(came_from, start, end))
+            return cost_so_far[end]
+
+        row, col = grid.row_col(current_node)
+        parent = came_from[current_node]
+        if parent is None: # the start looks every way
+            directions = ((0, -1), (0, 1), (-1, 0), (1, 0))
+        else: # keep going the same way, or turn
+            parent_row, parent_col = grid.row_col(parent)
+            d_row = (row > parent_row) - (row < parent_row)
+            d_col = (col > parent_col) - (col < parent_col)
+            if d_col:
+                directions = ((0, d_col), (-1, 0), (1, 0))
+            else:
+                directions = ((d_row, 0), (0, -1), (0, 1))
+
+        for d_row, d_col in directions:
+            next_node = jump(grid, current_node, d_row, d_col, end)
+            if next_node is None:
+                continue
+
+            next_row, next_col = grid.row_col(next_node)
+            new_cost = cost_so_far[current_node] + (abs(next_row - row) + abs(next_col - col)) * OPEN_COST
+
+            if not next_node in cost_so_far or new_cost < cost_so_far[next_node]:
+                cost_so_far[next_node] = new_cost # Save the new cost of jump point
+                priority = new_cost + grid.heuristic(next_node, end)
+                que.enque(next_node, priority)
+                came_from[next_node] = current_node
+                yield OPEN, next_node
+
+
+def straight_path(grid, jump_points):
+    """Fills in the cells between jump points, which always share a row or a column."""
+    path = [jump_points[0]]
+
+    for node in jump_points[1:]:
+        row, col = grid.row_col(path[-1])
+        next_row, next_col = grid.row_col(node)
+        step = (next_row > row) - (next_row < row) or (next_col > col) - (next_col < col)
+        if next_row != row:
+            step *= grid.cols
+
+        path.extend(range(path[-1] + step, node + step, step))
+
+    return path
+
+
+def bidirectional_steps(grid, start, end, use_heuristic, stats=None, heuristic=None):
+    """Runs Dijkstra (or A* with use_heuristic) from start and end at the same time, rebuilds the
+    path once no better meeting point can show up. A* uses the average of both heuristics as
+    potential so the two frontiers agree on edge costs; priorities are doubled to stay integers."""
+    estimate = grid.estimate(heuristic)
+
+    def potential(node): # twice the forward potential, the backward one is its negative
+        if not use_heuristic:
+            return 0
+        return estimate(node, end) - estimate(node, start)
+
+    if start == end:
+        yield CLOSE, start
+        yield FOUND, [start]
+        return 0
+
+    if not grid.connected(start, end): # Walls keep them apart, no need to search
+        return None
+
+    ques = (PriorityQue(stats), PriorityQue(stats)) # forward que, backward que
+    ques[0].enque(start, potential(start))
+    ques[1].enque(end, -potential(end))
+
+    came_from = ({start: None}, {end: None}) # forward: previous node, backward: next node
+    cost_so_far = ({start: 0}, {end: 0}) # forward: cost from start, backward: cost to end
+    best_cost = None # cheapest start to end cost seen so far
+    meet = None # node where that path goes from one search to the other
+
+    while ques[0] and ques[1]:
+        if best_cost is not None and ques[0].top_priority() + ques[1].top_priority() >= 2 * best_cost:
+            break # Nothing left in the ques can beat the best path
+
+        side = 0 if ques[0].top_priority() <= ques[1].top_priority() else 1
+        other = 1 - side
+        sign = 1 if side == 0 else -1
+
+        current_node = ques[side].deque() # Gets lowest costly node of the cheaper side
+        yield CLOSE, current_node
+
+        for next_node in grid.neighbors(current_node):
+            if side == 0: # Stepping onto next_node, or backwards off it onto current_node
+                new_cost = cost_so_far[side][current_node] + grid.step_cost(current_node, next_node)
+            else:
+                new_cost = cost_so_far[side][current_node] + grid.step_cost(next_node, current_node)
+
+            if not next_node in cost_so_far[side] or new_cost < cost_so_far[side][next_node]:
+                cost_so_far[side][next_node] = new_cost
+                ques[side].enque(next_node, 2 * new_cost + sign * potential(next_node))
+                came_from[side][next_node] = current_node
+                yield OPEN, next_node
+
+                if next_node in cost_so_far[other]: # Both searches reached it
+                    total = new_cost + cost_so_far[other][next_node]
+                    if best_cost is None or total < best_cost:
+                        best_cost = total
+                        meet = next_node
+
+    if best_cost is None:
+        return None
+
+    yield FOUND, joined_path(came_from[0], came_from[1], start, meet, end)
+    return best_cost
+
+
+def bidirectional_dijkstra_steps(grid, start, end, stats=None):
+    """Runs the bidirectional Dijkstra search."""
+    return (yield from bidirectional_steps(grid, start, end, False, stats))
+
+
+def bidirectional_a_star_steps(grid, start, end, stats=None, heuristic=None):
+    """Runs the bidirectional A* search."""
+    return (yield from bidirectional_steps(grid, start, end, True, stats, heuristic))
+
+
+def changed_cells(grid, seen, block=4096):
+    """Cells whose terrain differs from seen, a copy of the cells taken earlier, which is brought
+    up to date. Compares block cells at once, so unchanged stretches cost a single compare."""
+    cells = grid.cells
+    changed = list()
+
+    for a in range(0, len(seen), block):
+        if cells[a:a + block] != seen[a:a + block]:
+            changed.extend(cell for cell in range(a, min(a + block, len(seen))) if cells[cell] != seen[cell])
+
+    seen[:] = cells[:len(seen)]
+    return changed
+
+
+class DStarLite():
+    """Incremental planner (D* Lite). Searches backwards from end, so g holds the cost from every
+    settled cell to end, and keeps that state between runs: the next steps() only repairs the
+    cells whose terrain changed since (found by diffing a copy of the cells) and copes with a
+    moved start by raising km, the key offset, instead of searching again from scratch. Changing
+    the grid's moves changes every cost, so then it does start over."""
+    INFINITY = float("inf")
+
+    def __init__(self, grid, start, end):
+        self.grid = grid
+        self.start = start
+        self.end = end
+        self.reset()
+
+    def reset(self):
+        """Forgets every cost, as before the first search."""
+        grid = self.grid
+        self.km = 0 # heuristic distance the start has moved since the first search
+        self.g = dict() # cost to end as of the last time the cell was settled
+        self.rhs = {self.end: 0} # cost to end through the best neighbor, one step ahead of g
+        self.que = PriorityQue() # cells whose g and rhs disagree
+        self.que.enque(self.end, self.key(self.end))
+        self.seen = bytearray(grid.cells[:len(grid)]) # terrain the state was built for
+        self.revision = grid.revision
+        self.moves = (grid.connectivity, grid.cutting) # moves the state was built for
+
+    def key(self, cell):
+        best = min(self.g.get(cell, self.INFINITY), self.rhs.get(cell, self.INFINITY))
+        return (best + self.grid.heuristic(self.start, cell) + self.km, best)
+
+    def adjacent(self, cell):
+        """Cells beside cell, walls included, and the diagonal ones if the grid moves that way: a
+        wall there also decides which diagonal moves cut past its corners."""
+        grid = self.grid
+        return [cell + offset for offset, side, other in grid.moves[grid.borders[cell]]]
+
+    def update(self, cell):
+        """Recomputes the rhs of cell and queues it if it is now inconsistent, returns whether it
+        was queued."""
+        grid = self.grid
+        if cell != self.end:
+            g = self.g
+            self.rhs[cell] = min([grid.step_cost(cell, next_cell) + g.get(next_cell, self.INFINITY)
+                                  for next_cell in grid.neighbors(cell)], default=self.INFINITY)
+
+        if self.g.get(cell, self.INFINITY) != self.rhs.get(cell, self.INFINITY):
+            self.que.enque(cell, self.key(cell))
+            return True
+
+        self.que.remove(cell)
+        return False
+
+    def changed_cells(self):
+        """Cells whose terrain differs from the copy, which is brought up to date."""
+        self.revision = self.grid.revision
+        return changed_cells(self.grid, self.seen)
+
+    def steps(self, start, stats=None):
+        """Search generator from start to end like the *_steps() functions, reusing the state of
+        the previous runs. A generator dropped halfway leaves the state usable."""
+        grid = self.grid
+        if (grid.connectivity, grid.cutting) != self.moves: # every cost is off
+            self.start = start
+            self.reset()
+        self.que.stats = stats
+
+        if start != self.start: # keys already queued stay lower bounds once raised by km
+            self.km += grid.heuristic(self.start, start)
+            self.start = start
+
+        if grid.revision != self.revision: # the copy is brought up to date, so every update
+            opened = list()                # is done before the first event
+            for cell in self.changed_cells(): # its own cost changes the edges into it
+                for next_cell in [cell] + self.adjacent(cell):
+                    if self.update(next_cell):
+                        opened.append(next_cell)
+            for next_cell in opened:
+                yield OPEN, next_cell
+
+        if not grid.connected(start, self.end): # Walls keep them apart, no need to search
+            return None
+
+        g, rhs, que = self.g, self.rhs, self.que
+        while que and (que.top_priority() < self.key(start) or rhs.get(start, self.INFINITY) != g.get(start, self.INFINITY)):
+            old_key = que.top_priority()
+            current_node = que.deque()
+            new_key = self.key(current_node)
+
+            if old_key < new_key: # start moved since it was queued
+                que.enque(current_node, new_key)
+                continue
+
+            opened = list()
+            if g.get(current_node, self.INFINITY) > rhs[current_node]: # got cheaper, settle it
+                g[current_node] = rhs[current_node]
+            else: # got dearer, unsettle it and let it find its way again
+                g[current_node] = self.INFINITY
+                if self.update(current_node):
+                    opened.append(current_node)
+
+            for next_node in grid.neighbors(current_node):
+                if self.update(next_node):
+                    opened.append(next_node)
+
+            yield CLOSE, current_node # every update is done, dropping the generator here is safe
+            for next_node in opened:
+                yield OPEN, next_node
+
+        if g.get(start, self.INFINITY) == self.INFINITY:
+            return None
+
+        path = [start] # walk down the costs to end
+        while path[-1] != self.end:
+            if len(path) > len(grid): # only costs left inconsistent can lead in circles
+                raise RuntimeError("D* Lite costs lead in circles from cell %d" % start)
+            path.append(min(grid.neighbors(path[-1]), key=lambda cell: grid.step_cost(path[-1], cell) + g.get(cell, self.INFINITY)))
+
+        yield FOUND, path
+        return path_cost(grid, path)
+
+
+def d_star_lite_steps(grid, start, end, stats=None):
+    """Runs D* Lite once, from scratch."""
+    return (yield from DStarLite(grid, start, end).steps(start, stats))
+
+
+class Hierarchy():
+    """Hierarchical pathfinding (HPA*). The grid is cut into size x size clusters and entrances
+    are picked along every border between two clusters. The costs between the entrances of a
+    cluster are found by searches that never leave it, once, the first time a query needs the
+    cluster. A query links start and end to the entrances of their clusters, searches that small
+    abstract graph, then refines each hop with a search inside one cluster. Paths come out near
+    optimal, not always optimal. Terrain edits only drop the clusters they touch (found by diffing
+    a copy of the cells), which are built again on demand."""
+    SPLIT = 6 # open stretches of a border at least this long get an entrance at both ends
+
+    def __init__(self, grid, size=16):
+        self.grid = grid
+        self.size = size # cluster side in cells
+        self.cluster_rows = -(-grid.rows // size)
+        self.cluster_cols = -(-grid.cols // size)
+        self.entrances = dict() # border (cluster, cluster below or right) -> [(cell, cell across), ...]
+        self.nodes = dict() # cluster -> {entrance cell: [cells across]}, built on first use
+        self.edges = dict() # cluster -> {entrance cell: [(entrance cell, cost), ...]}, built with nodes
+        self.seen = bytearray(grid.cells[:len(grid)]) # terrain the clusters were built for
+        self.revision = grid.revision
+        self.moves = (grid.connectivity, grid.cutting) # moves the clusters were built for
+        self.stats = None # stats.SearchStats of the running query, the local searches count into it
+
+        for cluster in range(self.cluster_rows * self.cluster_cols):
+            for border in self.borders(cluster):
+                if border[0] == cluster:
+                    self.entrances[border] = self.border_entrances(*border)
+
+    def cluster(self, cell):
+        row, col = divmod(cell, self.grid.cols)
+        return row // self.size * self.cluster_cols + col // self.size
+
+    def bounds(self, cluster):
+        """First row, last row + 1, first column and last column + 1 of a cluster."""
+        row, col = divmod(cluster, self.cluster_cols)
+        row, col = row * self.size, col * self.size
+        return row, min(row + self.size, self.grid.rows), col, min(col + self.size, self.grid.cols)
+
+    def borders(self, cluster):
+        """Borders of the cluster with the clusters around it, as (upper or left, lower or right)."""
+        row, col = divmod(cluster, self.cluster_cols)
+        borders = list()
+        if col > 0:
+            borders.append((cluster - 1, cluster))
+        if col < self.cluster_cols - 1:
+            borders.append((cluster, cluster + 1))
+        if row > 0:
+            borders.append((cluster - self.cluster_cols, cluster))
+        if row < self.cluster_rows - 1:
+            borders.append((cluster, cluster + self.cluster_cols))
+        return borders
+
+    def border_entrances(self, a, b):
+        """Pairs of cells facing each other across the border of clusters a and b. Every stretch
+        of open pairs with the same terrain on both sides gets one entrance in its middle, or one
+        at each end if it is long, so water crossings never hide a cheaper open one."""
+        grid = self.grid
+        top, bottom, left, right = self.bounds(a)
+        if b == a + self.cluster_cols: # b is below
+            pairs = [((bottom - 1) * grid.cols + col, bottom * grid.cols + col) for col in range(left, right)]
+        else: # b is to the right
+            pairs = [(row * grid.cols + right - 1, row * grid.cols + right) for row in range(top, bottom)]
+
+        entrances = list()
+        run = list()
+        for pair in pairs + [None]:
+            if run and (pair is None or grid.is_wall(pair[0]) or grid.is_wall(pair[1])
+                        or (grid.cost(pair[0]), grid.cost(pair[1])) != (grid.cost(run[0][0]), grid.cost(run[0][1]))):
+                if len(run) < self.SPLIT:
+                    entrances.append(run[len(run) // 2])
+                else:
+                    entrances.extend((run[0], run[-1]))
+                run = list()
+
+            if pair is not None and not grid.is_wall(pair[0]) and not grid.is_wall(pair[1]):
+                run.append(pair)
+
+        return entrances
+
+    def cluster_nodes(self, cluster):
+        """Entrance cells of the cluster and the costs between them, built the first time asked."""
+        if not cluster in self.edges:
+            self.build(cluster)
+        return self.nodes[cluster], self.edges[cluster]
+
+    def build(self, cluster):
+        """Collects the entrance cells of the cluster and the costs between them."""
+        nodes = dict()
+        for border in self.borders(cluster):
+            side = 0 if border[0] == cluster else 1
+            for pair in self.entrances[border]:
+                nodes.setdefault(pair[side], list()).append(pair[1 - side])
+
+        order = list(nodes)
+        edges = {node: list() for node in order}
+        if self.grid.connectivity == 8: # diagonal moves cost more, no shortcut for the way back
+            for node in order:
+                cost_so_far = self.local_search(cluster, node, order)[0]
+                edges[node].extend((other, cost_so_far[other]) for other in order if other != node and other in cost_so_far)
+        else: # A reversed path costs what its first cell costs instead of its last, so one
+              # search per pair of entrances gives the costs both ways
+            for i, node in enumerate(order[:-1]):
+                cost_so_far = self.local_search(cluster, node, order[i + 1:])[0]
+                for other in order[i + 1:]:
+                    if other in cost_so_far:
+                        edges[node].append((other, cost_so_far[other]))
+                        edges[other].append((node, cost_so_far[other] - self.grid.cost(other) + self.grid.cost(node)))
+
+        self.nodes[cluster] = nodes
+        self.edges[cluster] = edges
+
+    def local_search(self, cluster, source, targets=(), backward=False):
+        """Dijkstra from source that never leaves the cluster, returns (cost_so_far, came_from).
+        Stops once every cell of targets is settled; backward costs are those of the paths into
+        source. Runs on a bare heap, it is called for every pair of entrances, but still counts its
+        pushes and stale pops into the stats of the running query."""
+        grid, stats = self.grid, self.stats
+        top, bottom, left, right = self.bounds(cluster)
+        heap = [(0, source)]
+        came_from = {source: None}
+        cost_so_far = {source: 0}
+        waiting = set(targets)
+
+        while heap:
+            cost, current_node = heapq.heappop(heap)
+            if cost > cost_so_far[current_node]: # stale entry
+                if stats is not None:
+                    stats.stale_pops += 1
+                continue
+            if current_node in waiting:
+                waiting.discard(current_node)
+                if not waiting:
+                    break
+
+            for next_node in grid.neighbors(current_node):
+                row, col = divmod(next_node, grid.cols)
+                if not (top <= row < bottom and left <= col < right):
+                    continue
+
+                new_cost = cost + (grid.step_cost(next_node, current_node) if backward else grid.step_cost(current_node, next_node))
+                if not next_node in cost_so_far or new_cost < cost_so_far[next_node]:
+                    cost_so_far[next_node] = new_cost
+                    came_from[next_node] = current_node
+                    heapq.heappush(heap, (new_cost, next_node))
+                    if stats is not None:
+                        stats.pushes += 1
+
+        return cost_so_far, came_from
+
+    def update(self):
+        """Drops the clusters whose terrain changed since the last query, and the clusters across
+        any border whose entrances moved, to be built again when needed."""
+        if self.grid.revision == self.revision:
+            return
+        self.revision = self.grid.revision
+
+        if (self.grid.connectivity, self.grid.cutting) != self.moves: # every cost is off
+            self.moves = (self.grid.connectivity, self.grid.cutting)
+            self.nodes.clear()
+            self.edges.clear()
+
+        dirty = {self.cluster(cell) for cell in changed_cells(self.grid, self.seen)}
+        for border in {border for cluster in dirty for border in self.borders(cluster)}:
+            entrances = self.border_entrances(*border)
+            if entrances != self.entrances[border]:
+                self.entrances[border] = entrances
+                dirty.update(border)
+
+        for cluster in dirty:
+            self.nodes.pop(cluster, None)
+            self.edges.pop(cluster, None)
+
+    def steps(self, start, end, stats=None):
+        """Search generator like the *_steps() functions. The events are those of the abstract
+        search, over entrance cells. Entrances only link cells straight across a border, so when
+        diagonals squeeze between walls (where a corner may be the only way through) it runs A*."""
+        grid = self.grid
+        self.stats = stats
+        if not grid.connected(start, end): # Walls keep them apart, no need to search
+            return None
+        if grid.connectivity == 8 and grid.cutting == CUT_BOTH:
+            return (yield from a_star_steps(grid, start, end, stats))
+        self.update()
+
+        start_cluster, end_cluster = self.cluster(start), self.cluster(end)
+        start_costs = self.local_search(start_cluster, start)[0]
+        end_costs = self.local_search(end_cluster, end, backward=True)[0]
+        start_links = [(node, start_costs[node]) for node in self.cluster_nodes(start_cluster)[0] if node in start_costs]
+        end_links = {node: end_costs[node] for node in self.cluster_nodes(end_cluster)[0] if node in end_costs}
+        if start_cluster == end_cluster and end in start_costs: # the path may stay inside
+            start_links.append((end, start_costs[end]))
+
+        que = PriorityQue(stats)
+        que.enque(start, 0)
+        came_from = {start: None}
+        cost_so_far = {start: 0}
+
+        while que:
+            current_node = que.deque()
+            yield CLOSE, current_node
+
+            if current_node == end:
+                break
+
+            nodes, edges = self.cluster_nodes(self.cluster(current_node))
+            hops = list()
+            if current_node == start:
+                hops.extend(start_links)
+            if current_node in nodes:
+                hops.extend(edges[current_node])
+                hops.extend((across, grid.step_cost(current_node, across)) for across in nodes[current_node])
+            if current_node in end_links:
+                hops.append((end, end_links[current_node]))
+
+            for next_node, cost in hops:
+                new_cost = cost_so_far[current_node] + cost
+
+                if not next_node in cost_so_far or new_cost < cost_so_far[next_node]:
+                    cost_so_far[next_node] = new_cost
+                    que.enque(next_node, new_cost + grid.heuristic(next_node, end))
+                    came_from[next_node] = current_node
+                    yield OPEN, next_node
+        else:
+            return None
+
+        hops = reconstructed_path(came_from, start, end)
+        path = [start]
+        for a, b in zip(hops, hops[1:]): # refine every hop into cells
+            if self.cluster(a) != self.cluster(b): # entrance to the cell across
+                path.append(b)
+            else:
+                came_from = self.local_search(self.cluster(a), a, [b])[1]
+                path.extend(reconstructed_path(came_from, a, b)[1:])
+
+        yield FOUND, path
+        return path_cost(grid, path)
+
+
+CLUSTER_SIZE = 16 # default cluster side of HPA*
+hierarchies = weakref.WeakKeyDictionary() # grid -> its Hierarchy, kept up to date by queries
+
+
+def hpa_star_steps(grid, start, end, stats=None):
+    """Runs HPA* over the grid's Hierarchy, made by the first query on the grid."""
+    if not grid in hierarchies:
+        hierarchies[grid] = Hierarchy(grid, CLUSTER_SIZE)
+    return (yield from hierarchies[grid].steps(start, end, stats))
+
+
+def bfs(grid, start, end):
+    """Runs the Breadth First Search to the end."""
+    return run(bfs_steps(grid, start, end))
+
+
+def dijkstra(grid, start, end):
+    """Runs the Dijkstra search to the end."""
+    return run(dijkstra_steps(grid, start, end))
+
+
+def greedy(grid, start, end, heuristic=None):
+    """Runs the greedy search to the end."""
+    return run(greedy_steps(grid, start, end, heuristic=heuristic))
+
+
+def a_star(grid, start, end, heuristic=None):
+    """Runs the A* search to the end."""
+    return run(a_star_steps(grid, start, end, heuristic=heuristic))
+
+
+def weighted_a_star(grid, start, end, weight=WEIGHT, heuristic=None):
+    """Runs the weighted A* search to the end."""
+    return run(weighted_a_star_steps(grid, start, end, weight=weight, heuristic=heuristic))
+
+
+def ara_star(grid, start, end, weight=WEIGHT, heuristic=None):
+    """Runs ARA* to the end, its SearchResult has the optimal path."""
+    return run(ara_star_steps(grid, start, end, weight=weight, heuristic=heuristic))
+
+
+def jps(grid, start, end):
+    """Runs the Jump Point Search to the end."""
+    return run(jps_steps(grid, start, end))
+
+
+def bidirectional_dijkstra(grid, start, end):
+    """Runs the bidirectional Dijkstra search to the end."""
+    return run(bidirectional_dijkstra_steps(grid, start, end))
+
+
+def bidirectional_a_star(grid, start, end, heuristic=None):
+    """Runs the bidirectional A* search to the end."""
+    return run(bidirectional_a_star_steps(grid, start, end, heuristic=heuristic))
+
+
+def d_star_lite(grid, start, end):
+    """Runs D* Lite to the end."""
+    return run(d_star_lite_steps(grid, start, end))
+
+
+def hpa_star(grid, start, end):
+    """Runs HPA* to the end."""
+    return run(hpa_star_steps(grid, start, end))
+
+
+ALGORITHMS = {
+    "bfs": bfs_steps,
+    "dijkstra": dijkstra_steps,
+    "greedy": greedy_steps,
+    "a_star": a_star_steps,
+    "weighted_a_star": weighted_a_star_steps,
+    "ara_star": ara_star_steps,
+    "jps": jps_steps,
+    "bidirectional_dijkstra": bidirectional_dijkstra_steps,
+    "bidirectional_a_star": bidirectional_a_star_steps,
+    "d_star_lite": d_star_lite_steps,
+    "hpa_star": hpa_star_steps,
+}
+
+# Algorithms taking a heuristic option, the name of one of the grid's heuristics
+HEURISTIC_ALGORITHMS = {"greedy", "a_star", "weighted_a_star", "ara_star", "bidirectional_a_star"}
+
+
+class SearchCache():
+    """Finished searches of one grid keyed by (algorithm, start, end, grid revision, options). Any
+    terrain change bumps the revision, so stale results are never served; past size entries, or
+    past max_events events held in all, the least recently used result is dropped. Event logs grow
+    with the map (2M for a Dijkstra over an open 1000x1000 one), so a result with more events
+    than max_events is kept as its path and cost only."""
+
+    def __init__(self, size=128, max_events=1000000):
+        self.size = size
+        self.max_events = max_events
+        self.results = OrderedDict() # oldest first
+        self.events = 0 # events held by the cached results
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def get(self, key):
+        """Cached result for the key or None, counting the hit or miss."""
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.results.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        if result.events is not None and len(result.events) > self.max_events:
+            result = SearchResult(result.path, result.cost, None)
+        old = self.results.pop(key, None)
+        if old is not None:
+            self.events -= len(old.events or ())
+
+        self.results[key] = result
+        self.events += len(result.events or ())
+
+        while len(self.results) > self.size or self.events > self.max_events:
+            self.events -= len(self.results.popitem(last=False)[1].events or ())
+
+    def steps(self, name, grid, start, end, stats=None, **options):
+        """Search generator of the algorithm name, replayed from the cache when possible. A search
+        run to the end is stored, unless the grid changed in the meantime. Options (the weight of
+        weighted A*, a heuristic name) are handed to the algorithm and are part of the key."""
+        revision = grid.revision
+        key = (name, start, end, revision) + tuple(sorted(options.items()))
+        result = self.get(key)
+        if stats is not None:
+            stats.cache_hits, stats.cache_misses = self.hits, self.misses
+        if result is not None:
+            if stats is not None:
+                stats.cached = True
+            return (yield from replayed_steps(result))
+
+        def done(result):
+            if grid.revision == revision:
+                self.put(key, result)
+
+        return (yield from recorded_steps(ALGORITHMS[name](grid, start, end, stats, **options), done))
+
+    def search(self, name, grid, start, end, **options):
+        """Runs the algorithm name to the end, or serves its cached result."""
+        key = (name, start, end, grid.revision) + tuple(sorted(options.items()))
+        result = self.get(key)
+        if result is None:
+            result = run(ALGORITHMS[name](grid, start, end, **options))
+            self.put(key, result)
+
+        return result
+
+    def clear(self):
+        self.results.clear()
+        self.events = 0
@@ -0,0 +1,105 @@
+"""
+Search Statistics
+
+Opt-in instrumentation of a search: counts expansions, relaxations, heap pushes and stale pops,
+and times the search, its neighbor generation and the drawing of its events. Nothing here is
+touched unless a SearchStats is handed to the search, so plain searches pay nothing for it.
+"""
+import csv
+import json
+import time
+
+import search
+
+
+class SearchStats():
+    FIELDS = ["algorithm", "cached", "cache_hits", "cache_misses", "found", "cost", "expansions", "relaxations", "pushes", "stale_pops",
+              "neighbor_calls", "search_time", "neighbor_time", "render_time"]
+
+    def __init__(self, algorithm=""):
+        self.algorithm = algorithm
+        self.cached = False # replayed from the SearchCache
+        self.cache_hits = None # hits and misses of the SearchCache so far, None if it was bypassed
+        self.cache_misses = None
+        self.found = False
+        self.cost = None
+        self.expansions = 0 # nodes taken off the frontier
+        self.relaxations = 0 # nodes added to the frontier or given a cheaper cost
+        self.pushes = 0 # entries pushed onto a PriorityQue heap
+        self.stale_pops = 0 # outdated heap entries skipped
+        self.neighbor_calls = 0
+        self.search_time = 0.0 # seconds inside the search, neighbor_time included
+        self.neighbor_time = 0.0 # seconds spent generating neighbors
+        self.render_time = 0.0 # seconds spent drawing the search
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def summary(self):
+        """Short lines for the GUI overlay."""
+        cache = "" if self.cache_hits is None else "  cache %d hits %d misses" % (self.cache_hits, self.cache_misses)
+        return [
+            "%s%s: %s, cost %s%s" % (self.algorithm, " (cached)" if self.cached else "",
+                                     "found" if self.found else "no path", self.cost, cache),
+            "expanded %d  relaxed %d  pushes %d  stale pops %d" % (self.expansions, self.relaxations,
+                                                                   self.pushes, self.stale_pops),
+            "search %.1f ms (neighbors %.1f ms)  drawing %.1f ms" % (self.search_time * 1000,
+                                                                    self.neighbor_time * 1000,
+                                                                    self.render_time * 1000),
+        ]
+
+
+class TimedGrid():
+    """Stands in for a grid.Grid, timing and counting every neighbors() call."""
+
+    def __init__(self, grid, stats):
+        self.grid = grid
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.grid, name)
+
+    def __len__(self):
+        return len(self.grid)
+
+    def neighbors(self, cell):
+        began = time.perf_counter()
+        neighbors = self.grid.neighbors(cell)
+        self.stats.neighbor_time += time.perf_counter() - began
+        self.stats.neighbor_calls += 1
+        return neighbors
+
+
+def instrumented_steps(steps, stats):
+    """Passes the events of a search generator along, counting them and timing the search."""
+    while True:
+        began = time.perf_counter()
+        try:
+            kind, value = next(steps)
+        except StopIteration as stop:
+            stats.search_time += time.perf_counter() - began
+            stats.cost = stop.value
+            return stop.value
+        stats.search_time += time.perf_counter() - began
+
+        if kind == search.CLOSE:
+            stats.expansions += 1
+        elif kind == search.OPEN:
+            stats.relaxations += 1
+        else:
+            stats.found = True
+        yield kind, value
+
+
+def dump(records, path):
+    """Appends SearchStats to a file: CSV if path ends in .csv, one JSON object per line otherwise."""
+    with open(path, "a", newline="") as out:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(out, fieldnames=SearchStats.FIELDS)
+            if out.tell() == 0:
+                writer.writeheader()
+            for stats in records:
+                writer.writerow(stats.as_dict())
+        else:
+            for stats in records:
+                out.write(json.dumps(stats.as_dict()) + "\n")
@@ -0,0 +1,37 @@
+"""Tests of the parallel batch runner, run with pytest."""
+import batch
+import maps
+import search
+
+
+def test_workers_serve_repeated_queries_from_their_cache():
+    grid = maps.generate("walls-10", 20, 20, 1)
+    (start, end), = maps.random_queries(grid, 1, 1)
+    start, end = grid.row_col(start), grid.row_col(end)
+    queries = [(index, start, end, "a_star") for index in range(3)]
+
+    results = sorted(batch.run_batch(grid, queries, workers=1), key=lambda result: result["query"])
+    assert [result["cached"] for result in results] == [False, True, True]
+    assert len({(result["cost"], result["expanded"]) for result in results}) == 1
+
+
+def test_run_batch_matches_the_searches(tmp_path):
+    """Workers mapping a temporary copy of the cells, or the binary map file itself, answer every
+    query like the search run in process."""
+    grid = maps.generate("water", 30, 30, 2)
+    names = list(search.ALGORITHMS)
+    queries = [(index, grid.row_col(start), grid.row_col(end), names[index % len(names)])
+               for index, (start, end) in enumerate(maps.random_queries(grid, 24, 2))]
+    queries.append((len(queries), (0, 0), (30, 0), "a_star"))
+    map_path = str(tmp_path / "map.pfm")
+    maps.save_binary(grid, map_path)
+
+    for shared in [None, map_path]:
+        results = {result["query"]: result for result in batch.run_batch(grid, queries, 2, 4, True, shared)}
+        assert sorted(results) == [query[0] for query in queries]
+        assert results[len(queries) - 1]["error"] == "off the map"
+
+        for index, start, end, name in queries[:-1]:
+            expected = search.run(search.ALGORITHMS[name](grid, grid.cell(*start), grid.cell(*end)))
+            assert results[index]["cost"] == expected.cost
+            assert [grid.cell(*cell) for cell in results[index]["path"]] == expected.path
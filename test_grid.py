@@ -0,0 +1,21 @@
+"""Tests of the grid and its connected regions, run with pytest."""
+import random
+
+import maps
+from grid import CUT_BOTH, CUT_NONE, OPEN, WALL, WATER, Grid
+
+
+def test_components_match_a_full_rebuild():
+    """Regions kept up to date edit by edit answer like labels rebuilt from scratch."""
+    for seed, (connectivity, cutting) in zip(range(6), [(4, CUT_NONE), (8, CUT_BOTH)] * 3):
+        rng = random.Random(seed)
+        grid = maps.generate("walls-40", 24, 24, seed)
+        grid.set_moves(connectivity, cutting)
+
+        for edit in range(200):
+            grid.set_terrain(rng.randrange(len(grid)), rng.choice([WALL, WALL, OPEN, WATER]))
+            fresh = Grid(grid.rows, grid.cols, bytearray(grid.cells), connectivity, cutting)
+            fresh.components.rebuild()
+            for pair in range(20):
+                a, b = rng.randrange(len(grid)), rng.randrange(len(grid))
+                assert grid.connected(a, b) == fresh.connected(a, b)
@@ -0,0 +1,50 @@
+"""Tests of map generation, saving and loading, run with pytest."""
+import pytest
+
+import maps
+from grid import OPEN, WALL, WATER
+
+
+def test_binary_round_trip_with_pawns(tmp_path):
+    grid = maps.generate("water", 17, 23, 4)
+    path = str(tmp_path / "map.pfm")
+    maps.save_binary(grid, path, 5, 300)
+
+    loaded, start, end = maps.load(path)
+    assert (loaded.rows, loaded.cols, start, end) == (17, 23, 5, 300)
+    assert bytes(loaded.cells) == bytes(grid.cells)
+
+    loaded.set_terrain(0, WALL if loaded.cells[0] != WALL else OPEN) # copy on write, the file keeps its cells
+    assert maps.load_binary(path)[0].cells[0] == grid.cells[0]
+
+    maps.save_binary(grid, path) # no pawns
+    assert maps.read_trailer(path) == (17, 23, None, None)
+
+
+def test_binary_load_rejects_other_files(tmp_path):
+    path = str(tmp_path / "map.txt")
+    maps.save_text(maps.generate("maze", 9, 9), path)
+    assert maps.read_trailer(path) is None
+    with pytest.raises(ValueError):
+        maps.load_binary(path)
+
+
+def test_text_round_trip(tmp_path):
+    grid = maps.generate("water", 12, 15, 1)
+    path = str(tmp_path / "map.txt")
+    maps.save_text(grid, path)
+
+    loaded, start, end = maps.load(path)
+    assert (loaded.rows, loaded.cols, start, end) == (12, 15, None, None)
+    assert bytes(loaded.cells) == bytes(grid.cells)
+
+
+def test_moving_ai_import(tmp_path):
+    path = tmp_path / "arena.map"
+    path.write_text("type octile\nheight 3\nwidth 4\nmap\n.G@O\nTSW.\n..?\n")
+
+    grid = maps.load(str(path))[0]
+    assert (grid.rows, grid.cols) == (3, 4)
+    assert list(grid.cells) == [OPEN, OPEN, WALL, WALL,
+                                WALL, WATER, WATER, OPEN,
+                                OPEN, OPEN, WALL, OPEN] # unknown symbols block, short rows stay open
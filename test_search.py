@@ -0,0 +1,275 @@
+"""Regression tests of the search engine, run with pytest."""
+import itertools
+import random
+
+import pytest
+
+import maps
+import search
+import stats
+from grid import CUT_BOTH, CUT_NONE, CUT_ONE, OPEN, WALL, WATER, heuristics as grid_heuristics
+
+
+def test_d_star_lite_dropped_then_resumed():
+    """A planner whose runs are dropped after any number of events still finds the cheapest path."""
+    for seed in range(40):
+        rng = random.Random(seed)
+        grid = maps.random_walls(20, 20, 0.25, seed)
+        start, end = 0, len(grid) - 1
+        grid.set_terrain(start, OPEN)
+        grid.set_terrain(end, OPEN)
+        planner = search.DStarLite(grid, start, end)
+
+        for edit in range(30):
+            cell = rng.randrange(1, len(grid) - 1)
+            grid.set_terrain(cell, WALL if grid.cells[cell] != WALL else OPEN)
+            for event in itertools.islice(planner.steps(start), rng.randrange(4)):
+                pass # dropped partway, like the GUI does on every edit
+
+            result = search.run(planner.steps(start))
+            assert result.cost == search.dijkstra(grid, start, end).cost
+
+
+def test_d_star_lite_after_the_moves_change():
+    """Changing the grid's moves under a planner starts it over instead of reusing old costs."""
+    changes = [((8, CUT_BOTH), (4, CUT_NONE)), ((8, CUT_ONE), (8, CUT_NONE)), ((4, CUT_NONE), (8, CUT_BOTH))]
+    for seed, (before, after) in itertools.product(range(10), changes):
+        grid = maps.generate("walls-25", 24, 24, seed)
+        grid.set_moves(*before)
+        start, end = maps.random_queries(grid, 1, seed)[0]
+        planner = search.DStarLite(grid, start, end)
+        search.run(planner.steps(start))
+
+        grid.set_moves(*after)
+        assert search.run(planner.steps(start)).cost == search.dijkstra(grid, start, end).cost
+
+
+def edited(grid, start, end, rng, edits=20):
+    """Changes a random cell other than the pawns per step, sometimes moving start too, and yields
+    start after every edit."""
+    for edit in range(edits):
+        cell = rng.choice([cell for cell in range(len(grid)) if cell not in (start, end)])
+        grid.set_terrain(cell, rng.choice([OPEN, WALL, WATER]))
+        if rng.random() < 0.3:
+            start = rng.choice([cell for cell in range(len(grid)) if not grid.is_wall(cell) and cell != end])
+        yield start
+
+
+def test_d_star_lite_after_edits_and_moves():
+    """A planner repairing its path after every edit and start move keeps the cheapest cost."""
+    for seed, moves in itertools.product(range(5), MOVES):
+        rng = random.Random(seed)
+        grid = maps.generate("walls-25", 32, 32, seed)
+        grid.set_moves(*moves)
+        start, end = maps.random_queries(grid, 1, seed)[0]
+        planner = search.DStarLite(grid, start, end)
+
+        for start in edited(grid, start, end, rng):
+            result = search.run(planner.steps(start))
+            assert result.cost == search.dijkstra(grid, start, end).cost
+            if result.found:
+                check_path(grid, result, start, end)
+
+
+KINDS = ["open", "walls-25", "maze", "water"]
+MOVES = [(4, CUT_NONE), (8, CUT_NONE), (8, CUT_ONE), (8, CUT_BOTH)]
+
+
+def seeded_queries(kinds=KINDS, moves=MOVES, size=24, count=4):
+    """(grid, start, end) of a few queries on every map kind, seed and way of moving."""
+    for kind, seed, (connectivity, cutting) in itertools.product(kinds, range(3), moves):
+        grid = maps.generate(kind, size, size, seed)
+        grid.set_moves(connectivity, cutting)
+        for start, end in maps.random_queries(grid, count, seed):
+            yield grid, start, end
+
+
+def check_path(grid, result, start, end):
+    """The path runs from start to end over moves the grid allows and costs what was reported."""
+    assert result.path[0] == start and result.path[-1] == end
+    assert all(next_cell in grid.neighbors(cell) for cell, next_cell in zip(result.path, result.path[1:]))
+    assert search.path_cost(grid, result.path) == result.cost
+
+
+def test_searches_against_dijkstra():
+    """A* matches Dijkstra's cost, greedy finds a path that costs no less."""
+    for grid, start, end in seeded_queries():
+        cheapest = search.dijkstra(grid, start, end)
+        check_path(grid, cheapest, start, end)
+        for name in ["bfs", "greedy", "a_star"]:
+            result = search.run(search.ALGORITHMS[name](grid, start, end))
+            check_path(grid, result, start, end)
+            assert result.cost >= cheapest.cost, name
+        assert search.a_star(grid, start, end).cost == cheapest.cost
+
+
+def test_start_on_end():
+    grid = maps.generate("walls-25", 10, 10, 1)
+    cell = maps.random_queries(grid, 1, 1)[0][0]
+    for name in search.ALGORITHMS:
+        result = search.run(search.ALGORITHMS[name](grid, cell, cell))
+        assert result.path == [cell] and result.cost == 0, name
+
+
+def test_bfs_is_optimal_without_water():
+    for grid, start, end in seeded_queries(["open", "walls-25", "maze"], MOVES[:1]):
+        assert search.bfs(grid, start, end).cost == search.dijkstra(grid, start, end).cost
+
+
+def test_priority_que_ties_and_decrease_key():
+    que = search.PriorityQue()
+    for node, priority in [("a", 2), ("b", 1), ("c", 2), ("d", 1)]:
+        que.enque(node, priority)
+    que.enque("c", 0) # decrease-key, the old entry goes stale
+    que.enque("b", 3) # and the other way
+
+    assert len(que) == 4 and "c" in que
+    assert que.top_priority() == 0
+    assert [que.deque() for i in range(4)] == ["c", "d", "a", "b"] # equal priorities first in first out
+    assert not que
+
+
+def test_priority_que_counts_pushes_and_stale_pops():
+    counts = stats.SearchStats()
+    que = search.PriorityQue(counts)
+    que.enque(1, 5)
+    que.enque(2, 6)
+    que.enque(1, 7) # stale entry at priority 5
+    que.remove(2) # stale entry at priority 6
+
+    assert len(que) == 1 and 2 not in que
+    assert que.deque() == 1
+    assert (counts.pushes, counts.stale_pops) == (3, 2)
+    with pytest.raises(IndexError):
+        que.deque()
+
+
+def test_jps_matches_a_star_expanding_fewer_nodes():
+    """JPS keeps the A* cost on wall-only grids while expanding only jump points, and falls back to
+    A* on grids with water."""
+    for grid, start, end in seeded_queries(["open", "walls-25", "water"], size=40):
+        result, a_star = search.jps(grid, start, end), search.a_star(grid, start, end)
+        check_path(grid, result, start, end)
+        assert result.cost == a_star.cost
+        assert len(result.visited) <= len(a_star.visited)
+
+
+def test_bidirectional_searches_are_optimal():
+    for grid, start, end in seeded_queries():
+        cheapest = search.dijkstra(grid, start, end).cost
+        for result in [search.bidirectional_dijkstra(grid, start, end), search.bidirectional_a_star(grid, start, end)]:
+            check_path(grid, result, start, end)
+            assert result.cost == cheapest
+
+
+def test_unreachable_targets_are_rejected():
+    grid = maps.generate("open", 10, 10)
+    for col in range(grid.cols):
+        grid.set_terrain(grid.cell(5, col), WALL)
+    start, end = grid.cell(0, 0), grid.cell(9, 9)
+
+    for name in search.ALGORITHMS:
+        result = search.run(search.ALGORITHMS[name](grid, start, end))
+        assert not result.found and result.cost is None and not result.events, name
+
+
+def test_search_cache_eviction_and_counts():
+    grid = maps.generate("walls-10", 20, 20)
+    (a, b), (c, d), (e, f) = maps.random_queries(grid, 3)
+    cache = search.SearchCache(size=2)
+
+    first = cache.search("a_star", grid, a, b)
+    assert cache.search("a_star", grid, a, b) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.search("dijkstra", grid, c, d)
+    cache.search("a_star", grid, a, b) # now the most recently used
+    cache.search("bfs", grid, e, f) # evicts dijkstra
+    assert len(cache) == 2 and (cache.hits, cache.misses) == (2, 3)
+    cache.search("dijkstra", grid, c, d)
+    assert cache.misses == 4
+
+    events = list(cache.steps("bfs", grid, e, f)) # served from the cache
+    assert cache.hits == 3 and events[-1] == (search.FOUND, search.bfs(grid, e, f).path)
+
+    grid.set_terrain(grid.cell(0, 0), WATER if grid.cost(grid.cell(0, 0)) != WATER else OPEN)
+    cache.search("dijkstra", grid, c, d)
+    assert cache.misses == 5 # new revision
+
+
+def test_search_cache_bounds_its_events():
+    grid = maps.generate("open", 30, 30)
+    queries = maps.random_queries(grid, 4)
+    logs = [len(search.dijkstra(grid, start, end).events) for start, end in queries]
+    cache = search.SearchCache(max_events=max(logs) + 1)
+
+    for start, end in queries:
+        cache.search("dijkstra", grid, start, end)
+        assert cache.events == sum(len(result.events) for result in cache.results.values()) <= cache.max_events
+    assert len(cache) < len(queries)
+
+    cache = search.SearchCache(max_events=min(logs) - 1) # every log is too long to keep
+    start, end = queries[0]
+    path = cache.search("dijkstra", grid, start, end).path
+    replayed = list(cache.steps("dijkstra", grid, start, end))
+    assert cache.hits == 1 and cache.events == 0 and replayed == [(search.FOUND, path)]
+
+
+def test_weighted_and_anytime_a_star():
+    """Weighted A* stays within its weight of the cheapest cost; ARA* ends on the cheapest path
+    with a bound of 1.0, and every path it yields on the way is within its bound at the time."""
+    for grid, start, end in seeded_queries():
+        cheapest = search.dijkstra(grid, start, end).cost
+        result = search.weighted_a_star(grid, start, end, weight=3.0)
+        check_path(grid, result, start, end)
+        assert cheapest <= result.cost <= 3.0 * cheapest
+
+        anytime = search.AnytimeAStar(grid, start, end, weight=3.0)
+        for kind, value in anytime.steps():
+            if kind == search.FOUND:
+                assert search.path_cost(grid, value) <= anytime.bound * cheapest
+        assert anytime.cost == cheapest and anytime.bound == 1.0
+        check_path(grid, search.ara_star(grid, start, end), start, end)
+
+
+def test_anytime_a_star_from_end_to_end():
+    grid = maps.generate("open", 1, 14)
+    anytime = search.AnytimeAStar(grid, 3, 3)
+    assert search.run(anytime.steps()).path == [3] and anytime.bound == 1.0
+
+
+def test_hpa_star_finds_near_optimal_paths():
+    for grid, start, end in seeded_queries(size=40):
+        result = search.hpa_star(grid, start, end)
+        check_path(grid, result, start, end)
+        assert result.cost >= search.dijkstra(grid, start, end).cost
+
+
+def test_hpa_star_after_edits():
+    """A hierarchy that only rebuilds the clusters edits touched finds what one built from scratch
+    finds."""
+    for seed, moves in itertools.product(range(5), MOVES):
+        rng = random.Random(seed)
+        grid = maps.generate("walls-25", 32, 32, seed)
+        grid.set_moves(*moves)
+        start, end = maps.random_queries(grid, 1, seed)[0]
+        hierarchy = search.Hierarchy(grid, 8)
+
+        for start in edited(grid, start, end, rng):
+            result = search.run(hierarchy.steps(start, end))
+            assert result.cost == search.run(search.Hierarchy(grid, 8).steps(start, end)).cost
+            assert result.found == grid.connected(start, end)
+            if result.found:
+                check_path(grid, result, start, end)
+
+
+def test_offered_heuristics_keep_ara_star_optimal():
+    """Every heuristic offered for the moves never overestimates, so ARA* with any of them ends on
+    the cheapest path; manhattan is not offered with 8 moves."""
+    assert "manhattan" in grid_heuristics(4) and "manhattan" not in grid_heuristics(8)
+    for grid, start, end in seeded_queries(["walls-25", "water"], MOVES):
+        cheapest = search.dijkstra(grid, start, end).cost
+        for name in grid_heuristics(grid.connectivity):
+            anytime = search.AnytimeAStar(grid, start, end, heuristic=name)
+            search.run(anytime.steps())
+            assert anytime.cost == cheapest and anytime.bound == 1.0, name
@@ -0,0 +1,30 @@
+"""Tests of the NumPy wavefront, run with pytest."""
+import itertools
+
+import pytest
+
+import maps
+import search
+import wavefront
+from grid import CUT_BOTH, CUT_NONE, CUT_ONE
+
+pytest.importorskip("numpy")
+
+
+def test_wavefront_paths_are_as_short_as_bfs():
+    for kind, seed, (connectivity, cutting) in itertools.product(["walls-25", "maze", "water"], range(3),
+                                                                 [(4, CUT_NONE), (8, CUT_NONE), (8, CUT_ONE), (8, CUT_BOTH)]):
+        grid = maps.generate(kind, 24, 24, seed)
+        grid.set_moves(connectivity, cutting)
+        start = maps.random_queries(grid, 1, seed)[0][0]
+        dist = wavefront.distance_field(grid, start)
+
+        for end in range(0, len(grid), 7):
+            path = wavefront.path_to(grid, dist, end)
+            if not grid.connected(start, end) or grid.is_wall(end):
+                assert dist[end] == -1 and path == []
+                continue
+
+            assert path[0] == start and path[-1] == end
+            assert all(next_cell in grid.neighbors(cell) for cell, next_cell in zip(path, path[1:]))
+            assert len(path) == len(search.bfs(grid, start, end).path) == dist[end] + 1
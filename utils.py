@@ -2,6 +2,7 @@
 import pygame
 
 class Button():
+    font = None # shared by every button, loaded on the first draw
 
     def __init__(self, x, y, w, h, text, color):
         self.x = x
@@ -10,16 +11,33 @@ class Button():
         self.h = h
         self.text = text
         self.color = color
+        self.label = None # text rendered once, again only when the text changes
+        self.label_text = None
+        self.drawn = None # (color, text) of the last draw
+
+    @property
+    def changed(self):
+        """Checks if the color or text changed since the button was last drawn."""
+        return self.drawn != (self.color, self.text)
 
     def draw_button(self, window):
-        """Draws the button on, if there's text, align the text in the middle of the button."""
-        pygame.draw.rect(window, self.color, (self.x, self.y, self.w, self.h), 0)
+        """Draws the button on, if there's text, align the text in the middle of the button.
+        Returns the area drawn."""
+        area = pygame.draw.rect(window, self.color, (self.x, self.y, self.w, self.h), 0)
+        self.drawn = (self.color, self.text)
 
         if self.text:
-            font = pygame.font.SysFont('comicsans', 20)
-            text = font.render(self.text, 1, (0,0,0))
+            if self.label_text != self.text:
+                if Button.font is None:
+                    Button.font = pygame.font.SysFont('comicsans', 20)
+                self.label = Button.font.render(self.text, 1, (0,0,0))
+                self.label_text = self.text
+
+            text = self.label
             window.blit(text, (self.x + (self.w / 2 - text.get_width() / 2), self.y + (self.h / 2 - text.get_height() / 2)))
 
+        return area
+
     def is_over(self, pos):
         """Checks if position of mouse on grid is inbetween the buttons area."""
         if pos[0]  > self.x and pos[0] < self.x + self.w:
@@ -28,35 +46,3 @@ class Button():
 
         return False
 
-
-class PriorityQue():
-
-    def __init__(self):
-        self.wait_list = list()
-
-    def deque(self):
-        """Re-organizes list before returning the most prioritized node tuple."""
-        self.wait_list.sort(key = lambda sub: sub[1]) # [[(nodex, nodey), priority], [(nodex, nodey), priority])]
-        return self.wait_list.pop(0)[0]
-
-    def enque(self, node, cost):
-        """Adds node to list"""
-        self.wait_list.append([node, cost])
-
-
-def get_cell_location(pos):
-    """Gets the cell's location based on the grid."""
-    x = 50 # grid's starting x
-    y = 20 # grid's starting y
-    target_x = None # holds the cells x value
-    target_y = None # holds the cells y value
-    for i in range(20):
-        if x <= pos[0]:
-            target_x = x
-        if y <= pos[1]:
-            target_y = y
-
-        x += 20
-        y += 20
-
-    return (target_x, target_y)
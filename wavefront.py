@@ -0,0 +1,82 @@
+"""
+Wavefront
+
+Breadth first distance field computed with NumPy: every step expands the whole frontier at once
+as an array of cell ids, instead of popping one node at a time. Gives the step distance from
+start to every cell (-1 where it can't reach) and a shortest path to any of them. Steps go to the
+4 or 8 neighbors, the way the grid moves, diagonals keeping to its corner cutting rule.
+
+NumPy is optional, only this module needs it.
+"""
+from grid import CUT_BOTH, CUT_ONE, MOVES, WALL
+
+try:
+    import numpy as np
+except ImportError: # only the wavefront needs numpy
+    np = None
+
+
+def available():
+    return np is not None
+
+
+def distance_field(grid, start):
+    """Steps from start to every cell as a flat int32 array indexed by cell id, -1 if unreachable."""
+    if np is None:
+        raise ImportError("numpy is needed for the wavefront distance field")
+
+    rows, cols = grid.rows, grid.cols
+    cells = np.frombuffer(grid.cells, dtype=np.uint8, count=rows * cols)
+    dist = np.full(rows * cols, -1, dtype=np.int32)
+    dist[cells == WALL] = -2 # never reached, reset to -1 at the end
+
+    if dist[start] == -2:
+        dist[dist == -2] = -1
+        return dist
+
+    dist[start] = 0
+    frontier = np.array([start], dtype=np.int64)
+    step = 0
+
+    while frontier.size:
+        step += 1
+        row, col = np.divmod(frontier, cols)
+        moves = list()
+        for d_row, d_col in MOVES[:grid.connectivity]:
+            inside = (0 <= row + d_row) & (row + d_row < rows) & (0 <= col + d_col) & (col + d_col < cols)
+            moved = frontier[inside]
+            if d_row and d_col and grid.cutting != CUT_BOTH: # the cells beside a diagonal
+                side, other = cells[moved + d_row * cols] != WALL, cells[moved + d_col] != WALL
+                moved = moved[(side | other) if grid.cutting == CUT_ONE else (side & other)]
+            moves.append(moved + d_row * cols + d_col)
+        candidates = np.concatenate(moves)
+        candidates = candidates[dist[candidates] == -1] # open and not reached yet
+        dist[candidates] = step
+        frontier = np.unique(candidates)
+
+    dist[dist == -2] = -1
+    return dist
+
+
+def path_to(grid, dist, end):
+    """Walks a distance field back from end to its start, returns the path (empty if unreachable)."""
+    if dist[end] < 0:
+        return list()
+
+    path = [end]
+    current = end
+    while dist[current] > 0:
+        for next_cell in grid.neighbors(current):
+            if dist[next_cell] == dist[current] - 1:
+                current = next_cell
+                break
+        path.append(current)
+
+    path.reverse()
+    return path
+
+
+def wavefront(grid, start, end):
+    """Distance field from start and the shortest path (in steps) to end."""
+    dist = distance_field(grid, start)
+    return dist, path_to(grid, dist, end)